@@ -2,13 +2,10 @@
 # The RLAI learns and improves through self-play
 
 from rl_ai import RLAI
+from mcts_ai import MCTSAI
 
 # For backward compatibility, expose RLAI as the main AI class
 SimpleAI = RLAI
 
-# Stubs used for animation calls - replaced by real references in main.py
-def screen_stub():
-    return None
-
-def stub_font():
-    return None
\ No newline at end of file
+# Opponents by name, for GameEngine(ai_types=...) and the --ai options
+AI_TYPES = {'simple': SimpleAI, 'mcts': MCTSAI}
@@ -0,0 +1,160 @@
+# animation.py
+# Frame-driven animation queue. Game logic posts animations and returns at once;
+# the main loop advances them by elapsed time and draws them over the frame.
+# Animations anchor to axial hex coords and are projected through the camera
+# when drawn, so they follow the map while the view pans or zooms.
+import random
+import pygame
+from settings import BLUE, RED, BLACK
+from hexgrid import axial_to_pixel
+
+# Visual jitter has its own RNG so drawing never consumes the game's random stream
+_fx_random = random.Random()
+
+
+def side_color(owner):
+    return BLUE if owner == 0 else RED
+
+
+class Animation:
+    """Base class: something drawn for `duration` seconds after `delay`."""
+    duration = 0.0
+
+    def __init__(self):
+        self.delay = 0.0
+        self.elapsed = 0.0
+
+    def draw(self, surface, t, camera=None):
+        # t is the time in seconds since the animation started
+        pass
+
+
+def _scale(camera):
+    return camera.zoom if camera is not None else 1
+
+
+class AttackFlash(Animation):
+    """Flash the attacker and target white, then shake them, `flashes` times."""
+    FLASH = 0.06
+    SHAKE = 0.03
+
+    def __init__(self, attacker_coord, target_coord, attacker_owner, target_owner, shake_intensity=6, flashes=2):
+        super().__init__()
+        self.attacker_coord = attacker_coord
+        self.target_coord = target_coord
+        self.attacker_color = side_color(attacker_owner)
+        self.target_color = side_color(target_owner)
+        self.shake_intensity = shake_intensity
+        self.cycle = self.FLASH + 3 * self.SHAKE
+        self.duration = flashes * self.cycle
+        self._shake_slot = None
+        self._offset = (0, 0)
+
+    def draw(self, surface, t, camera=None):
+        sx, sy = axial_to_pixel(*self.attacker_coord, camera=camera)
+        tx, ty = axial_to_pixel(*self.target_coord, camera=camera)
+        z = _scale(camera)
+        phase = t % self.cycle
+        if phase < self.FLASH:
+            pygame.draw.circle(surface, (255,255,255), (sx, sy), max(2, int(18 * z)))
+            pygame.draw.circle(surface, (255,255,255), (tx, ty), max(2, int(18 * z)))
+            return
+        # a new random offset every SHAKE seconds
+        slot = int(t / self.cycle) * 3 + int((phase - self.FLASH) / self.SHAKE)
+        if slot != self._shake_slot:
+            self._shake_slot = slot
+            k = self.shake_intensity
+            self._offset = (_fx_random.randint(-k, k), _fx_random.randint(-k, k))
+        ox, oy = self._offset
+        pygame.draw.circle(surface, self.attacker_color, (sx + ox, sy + oy), max(2, int(14 * z)))
+        pygame.draw.circle(surface, self.target_color, (tx - ox, ty - oy), max(2, int(14 * z)))
+
+
+class DeathFade(Animation):
+    """Shrink a dying unit's icon to nothing. shape is 'circle', 'up' or 'down' (triangles)."""
+    duration = 0.2
+
+    def __init__(self, coord, owner, shape='circle'):
+        super().__init__()
+        self.coord = coord
+        self.color = side_color(owner)
+        self.shape = shape
+
+    def draw(self, surface, t, camera=None):
+        x, y = axial_to_pixel(*self.coord, camera=camera)
+        i = max(1, int(12 * _scale(camera) * (1 - t / self.duration)))
+        if self.shape == 'up':
+            pygame.draw.polygon(surface, self.color, [(x, y-i), (x-i, y+i), (x+i, y+i)])
+        elif self.shape == 'down':
+            pygame.draw.polygon(surface, self.color, [(x, y+i), (x-i, y-i), (x+i, y-i)])
+        else:
+            pygame.draw.circle(surface, self.color, (x, y), i)
+
+
+class FloatingText(Animation):
+    """Damage/miss text that drops onto a hex from above and disappears."""
+
+    def __init__(self, text, coord, font, color=BLACK, rise=40, duration=40 / 60):
+        super().__init__()
+        self.text = text
+        self.coord = coord
+        self.font = font
+        self.color = color
+        self.rise = rise
+        self.duration = duration
+
+    def draw(self, surface, t, camera=None):
+        from ui import render_text
+        txt = render_text(self.font, self.text, self.color)
+        x, y = axial_to_pixel(*self.coord, camera=camera)
+        # starts `rise` pixels up and settles onto the hex, like the old frame timer
+        dy = self.rise * _scale(camera) * (1 - t / self.duration)
+        surface.blit(txt, (x - txt.get_width()//2, int(y - dy)))
+
+
+class AnimationQueue:
+    """Timeline of posted animations, advanced by elapsed time each frame.
+
+    post(anim) starts it after every blocking animation already queued; with
+    block=False it does not hold back the animations posted after it, and with
+    wait=False it starts right away.
+    """
+
+    def __init__(self):
+        self.active = []
+        self.blocked_until = 0.0  # seconds from now until the blocking chain is done
+
+    def post(self, anim, wait=True, block=True):
+        anim.delay = self.blocked_until if wait else 0.0
+        if block:
+            self.blocked_until = anim.delay + anim.duration
+        self.active.append(anim)
+        return anim
+
+    def update(self, dt):
+        self.blocked_until = max(0.0, self.blocked_until - dt)
+        still = []
+        for anim in self.active:
+            if anim.delay > 0:
+                anim.delay -= dt
+                if anim.delay < 0:
+                    anim.elapsed = -anim.delay
+                    anim.delay = 0.0
+            else:
+                anim.elapsed += dt
+            if anim.elapsed < anim.duration:
+                still.append(anim)
+        self.active = still
+
+    def draw(self, surface, camera=None):
+        for anim in self.active:
+            if anim.delay <= 0:
+                anim.draw(surface, anim.elapsed, camera)
+
+    @property
+    def busy(self):
+        return bool(self.active)
+
+    def clear(self):
+        self.active = []
+        self.blocked_until = 0.0
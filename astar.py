@@ -1,6 +1,12 @@
 # astar.py
 # A* pathfinding for hex grids (axial coordinates)
 import heapq
+from array import array
+from hexgrid import HexGrid, TERRAIN_CODES, PLAIN, FOREST_CODE
+from settings import MOVE_COST_PLAIN, MOVE_COST_FOREST
+
+# Cost to enter a cell by terrain code; codes not listed (rock) cannot be entered
+MOVE_COSTS = {PLAIN: MOVE_COST_PLAIN, FOREST_CODE: MOVE_COST_FOREST}
 
 def heuristic(a, b):
     # Manhattan distance on a hex grid
@@ -23,6 +29,8 @@ def neighbors(coord, map_coords, terrain_map=None, block_terrain=None):
 
 def astar(start, goal, map_coords, terrain_map=None, block_terrain=None):
     # Returns a list of axial coords from start to goal (inclusive), or [] if no path
+    if isinstance(map_coords, HexGrid):
+        return astar_grid(map_coords, start, goal, block_terrain if terrain_map else None)
     frontier = []
     heapq.heappush(frontier, (0, start))
     came_from = {start: None}
@@ -49,3 +57,149 @@ def astar(start, goal, map_coords, terrain_map=None, block_terrain=None):
     path.append(start)
     path.reverse()
     return path
+
+def astar_grid(grid, start, goal, block_terrain=None):
+    # Same search on a HexGrid: integer cell ids, the precomputed neighbor table,
+    # terrain codes and the distance table as the heuristic. Ids sort like coords,
+    # so ties in the frontier break exactly as in astar() above.
+    s = grid.index.get(start)
+    g = grid.index.get(goal)
+    if s is None or g is None:
+        return []
+    blocked = {TERRAIN_CODES[t] for t in block_terrain} if block_terrain else ()
+    neighbors = grid.neighbors
+    terrain = grid.terrain
+    h = grid.distance_row(g)
+    frontier = [(0, s)]
+    came_from = {s: -1}
+    cost_so_far = {s: 0}
+    while frontier:
+        _, current = heapq.heappop(frontier)
+        if current == g:
+            break
+        new_cost = cost_so_far[current] + 1
+        for nxt in neighbors[6*current:6*current + 6]:
+            if nxt < 0 or (blocked and terrain[nxt] in blocked):
+                continue
+            if nxt not in cost_so_far or new_cost < cost_so_far[nxt]:
+                cost_so_far[nxt] = new_cost
+                heapq.heappush(frontier, (new_cost + h[nxt], nxt))
+                came_from[nxt] = current
+    if g not in came_from:
+        return []
+    path = []
+    curr = g
+    while curr != -1:
+        path.append(grid.coords[curr])
+        curr = came_from[curr]
+    path.reverse()
+    return path
+
+class FlowFieldCache:
+    """Distance-to-goal maps shared by every unit heading for the same goal.
+
+    One breadth-first search from a goal cell (step cost 1, blocked terrain
+    skipped, as in astar) gives every cell its distance to that goal; a unit's
+    next step is then any neighbor one step closer, found in O(1). Fields are
+    keyed by goal cell and dropped when the grid's terrain version changes. A
+    goal that moves simply asks for the field of its new cell.
+    """
+    def __init__(self, grid, block_terrain=('rock',), max_fields=256):
+        self.grid = grid
+        self.blocked = {TERRAIN_CODES[t] for t in block_terrain}
+        self.max_fields = max_fields
+        self.fields = {}
+        self.terrain_version = grid.terrain_version
+        self.hits = 0
+        self.misses = 0
+
+    def field(self, goal_cell):
+        """Distances from every cell to goal_cell by id; -1 where unreachable."""
+        if self.terrain_version != self.grid.terrain_version:
+            self.fields.clear()
+            self.terrain_version = self.grid.terrain_version
+        dist = self.fields.get(goal_cell)
+        if dist is not None:
+            self.hits += 1
+            return dist
+        self.misses += 1
+        if len(self.fields) >= self.max_fields:
+            self.fields.clear()
+        grid = self.grid
+        neighbors = grid.neighbors
+        terrain = grid.terrain
+        blocked = self.blocked
+        dist = array('i', [-1]) * grid.size
+        dist[goal_cell] = 0
+        frontier = [goal_cell]
+        d = 0
+        while frontier:
+            d += 1
+            nxt = []
+            for c in frontier:
+                for n in neighbors[6*c:6*c + 6]:
+                    if n >= 0 and dist[n] < 0 and terrain[n] not in blocked:
+                        dist[n] = d
+                        nxt.append(n)
+            frontier = nxt
+        self.fields[goal_cell] = dist
+        return dist
+
+    def next_step(self, start, goal):
+        """Next coord on a shortest path from start to goal, or None if there is none."""
+        grid = self.grid
+        s = grid.index.get(start)
+        g = grid.index.get(goal)
+        if s is None or g is None or s == g:
+            return None
+        dist = self.field(g)
+        d = dist[s]
+        if d <= 0:
+            return None
+        for n in grid.neighbors[6*s:6*s + 6]:
+            if n >= 0 and dist[n] == d - 1:
+                return grid.coords[n]
+        return None
+
+def reachable(grid, start, budget, occupied=None, move_costs=MOVE_COSTS):
+    """Bounded Dijkstra flood fill from cell id `start` on a HexGrid.
+
+    Entering a cell costs move_costs[terrain code]; terrain without a cost and
+    cells in `occupied` (a container of coords) block. Only cells with total
+    cost <= budget are visited, so the work is O(cells in range).
+    Returns (costs, parents): dicts keyed by cell id, start included at cost 0.
+    """
+    neighbors = grid.neighbors
+    terrain = grid.terrain
+    coords = grid.coords
+    costs = {start: 0}
+    parents = {start: -1}
+    frontier = [(0, start)]
+    while frontier:
+        cost, current = heapq.heappop(frontier)
+        if cost > costs[current]:
+            continue
+        for nxt in neighbors[6*current:6*current + 6]:
+            if nxt < 0:
+                continue
+            step = move_costs.get(terrain[nxt])
+            if step is None:
+                continue
+            new_cost = cost + step
+            if new_cost > budget or new_cost >= costs.get(nxt, budget + 1):
+                continue
+            if occupied and coords[nxt] in occupied:
+                continue
+            costs[nxt] = new_cost
+            parents[nxt] = current
+            heapq.heappush(frontier, (new_cost, nxt))
+    return costs, parents
+
+def reach_path(grid, parents, cell):
+    # Coords from the flood-fill start to `cell` (inclusive) following parent pointers
+    path = []
+    while cell != -1:
+        path.append(grid.coords[cell])
+        cell = parents[cell]
+    path.reverse()
+    return path
@@ -0,0 +1,298 @@
+# benchmark.py
+# Benchmarks for the hot paths across map radius 3/10/30 and 12/100/1000 units.
+# Usage: python benchmark.py [--quick] [--only astar,los] [--out benchmark_results.json]
+#        python benchmark.py --baseline benchmark_baseline.json [--save-baseline] [--threshold 0.25]
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT
+from hexgrid import draw_map
+from astar import astar
+from entities import Longbow
+from engine import GameEngine
+from gamestate import GameState
+
+RADII = (3, 10, 30)
+UNIT_COUNTS = (12, 100, 1000)
+WEIGHTS = 'rl_weights.json'
+
+
+def measure(fn, ops=1, min_time=0.2, max_repeat=50):
+    """Call fn until min_time has passed (at least 3 times, at most max_repeat) and
+    return per-operation timings in microseconds; fn does `ops` operations per call."""
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_repeat and (len(times) < 3 or time.perf_counter() - start < min_time):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    times.sort()
+    scale = 1e6 / max(ops, 1)
+    return {
+        'median_us': times[len(times) // 2] * scale,
+        'min_us': times[0] * scale,
+        'ops': ops,
+        'repeats': len(times),
+    }
+
+
+class Scenario:
+    """A seeded AI-vs-AI game at its opening position."""
+
+    def __init__(self, radius, units, seed=0):
+        self.radius = radius
+        self.engine = GameEngine(radius, units, ai_weights={0: WEIGHTS, 1: WEIGHTS}, seed=seed)
+        self.rng = random.Random(seed)
+
+
+def bench_astar(sc):
+    engine = sc.engine
+    open_coords = [c for c in engine.grid if c not in engine.terrain_map]
+    pairs = [(sc.rng.choice(open_coords), sc.rng.choice(open_coords)) for _ in range(50)]
+
+    def run():
+        for start, goal in pairs:
+            astar(start, goal, engine.grid, engine.terrain_map, block_terrain=('rock',))
+    return run, len(pairs)
+
+
+def bench_possible_moves(sc):
+    engine = sc.engine
+    units = engine.units
+
+    def run():
+        for u in units:
+            u._reach_cache = None  # time the flood fill, not the cache
+            u.possible_moves(engine.grid, engine.terrain_map)
+    return run, len(units)
+
+
+class _Spot:
+    # Stand-in target: line of sight only looks at the target's hex
+    def __init__(self, q, r):
+        self.q, self.r = q, r
+
+
+def bench_los(sc):
+    # A Longbow standing on every unit's hex, checked against every hex within range
+    engine = sc.engine
+    grid = engine.grid
+    pairs = []
+    for u in engine.units:
+        archer = Longbow('L', u.q, u.r, owner=u.owner)
+        archer.registry = engine.registry
+        pairs.extend((archer, _Spot(*c)) for c in grid
+                     if 0 < grid.coord_distance((u.q, u.r), c) <= archer.range)
+    units = engine.units
+
+    def run():
+        for archer, target in pairs:
+            archer.has_line_of_sight(target, units, engine.terrain_map, engine.grid)
+    return run, len(pairs)
+
+
+def bench_take_actions(sc):
+    # One AI phase from the same position each time
+    engine = sc.engine
+    start = engine.snapshot()
+    ai = engine.ais[1]
+
+    def run():
+        engine.restore(start)
+        ai.take_actions()
+    return run, 1
+
+
+def bench_state_clone(sc):
+    state = GameState.from_engine(sc.engine)
+
+    def run():
+        for _ in range(100):
+            state.clone()
+    return run, 100
+
+
+def bench_make_unmake(sc):
+    # Every unit's first move and first attack on the compact state, each taken back
+    state = GameState.from_engine(sc.engine)
+    moves, attacks = [], []
+    for i in range(len(state)):
+        if state.alive[i]:
+            cells = state.moves(i)
+            if cells:
+                moves.append((i, cells[0]))
+            attacks.extend((i, j) for j in state.targets(i)[:1])
+    if not attacks:
+        # opening positions are rarely in contact; attacks do not check range
+        attacks = [(i, state.living(1 - state.owner[i])[0]) for i, _ in moves]
+
+    def run():
+        for i, cell in moves:
+            state.move(i, cell)
+            state.undo()
+        for i, j in attacks:
+            state.attack(i, j, 3)
+            state.undo()
+    return run, len(moves) + len(attacks)
+
+
+def _pygame():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    if not pygame.display.get_init():
+        pygame.init()
+        pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    return pygame
+
+
+def bench_draw_map(sc):
+    pygame = _pygame()
+    engine = sc.engine
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    def run():
+        draw_map(surface, engine.map_coords, engine.terrain_map)
+    return run, 1
+
+
+def bench_frame(sc):
+    # A full redraw of every layer through the renderer, then a display flip
+    pygame = _pygame()
+    from renderer import MapRenderer
+    engine = sc.engine
+    screen = pygame.display.get_surface()
+    font = pygame.font.SysFont('Arial', 16)
+    renderer = MapRenderer((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    def run():
+        renderer.mark_dirty()
+        renderer.set_terrain(engine.map_coords, engine.terrain_map, engine.grid.terrain_version)
+        renderer.set_highlight(())
+        renderer.set_units(engine.units, font)
+        renderer.begin_ui(None)
+        renderer.draw(screen)
+        pygame.display.flip()
+    return run, 1
+
+
+# name -> (setup, depends on the unit count)
+BENCHMARKS = {
+    'astar': (bench_astar, False),
+    'possible_moves': (bench_possible_moves, True),
+    'los': (bench_los, True),
+    'take_actions': (bench_take_actions, True),
+    'state_clone': (bench_state_clone, True),
+    'make_unmake': (bench_make_unmake, True),
+    'draw_map': (bench_draw_map, False),
+    'frame': (bench_frame, True),
+}
+
+
+def run_benchmarks(names=None, radii=RADII, unit_counts=UNIT_COUNTS, min_time=0.2, seed=0, verbose=True):
+    """Run the selected benchmarks on every (radius, units) size that fits on the map.
+    Returns {'bench/r<radius>/u<units>': timings}."""
+    names = names or list(BENCHMARKS)
+    results = {}
+    for radius in radii:
+        cells = 3 * radius * (radius + 1) + 1
+        # spawning puts each side on its own half, so a side needs room on that half
+        counts = [n for n in unit_counts if n <= cells // 2]
+        for units in counts:
+            sc = None
+            for name in names:
+                setup, per_units = BENCHMARKS[name]
+                if not per_units and units != counts[0]:
+                    continue
+                if sc is None:
+                    sc = Scenario(radius, units, seed)
+                fn, ops = setup(sc)
+                key = f'{name}/r{radius}/u{units}'
+                results[key] = measure(fn, ops, min_time)
+                if verbose:
+                    r = results[key]
+                    print(f"{key:28} {r['median_us']:12.1f} us/op  (min {r['min_us']:.1f}, {ops} ops x {r['repeats']})")
+    return results
+
+
+def compare(results, baseline, threshold=0.25):
+    """Lines comparing median timings with a baseline, and the keys that got slower
+    by more than `threshold` (a fraction)."""
+    lines, regressions = [], []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            lines.append(f'{key:28} {"new":>10}')
+            continue
+        ratio = r['median_us'] / base['median_us'] if base['median_us'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        lines.append(f"{key:28} {base['median_us']:12.1f} -> {r['median_us']:12.1f} us/op  x{ratio:5.2f}{flag}")
+    return lines, regressions
+
+
+def environment():
+    env = {'python': platform.python_version(), 'platform': platform.platform(),
+           'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+    try:
+        import numpy
+        env['numpy'] = numpy.__version__
+    except ImportError:
+        env['numpy'] = None
+    try:
+        import pygame
+        env['pygame'] = pygame.version.ver
+    except ImportError:
+        env['pygame'] = None
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark TinyHex hot paths.')
+    parser.add_argument('--only', default=None, help='comma-separated benchmarks: ' + ','.join(BENCHMARKS))
+    parser.add_argument('--quick', action='store_true', help='radius 3/10 and 12/100 units only')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds spent timing each case')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help='compare against this results file')
+    parser.add_argument('--save-baseline', action='store_true', help='also write the results to --baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='slowdown that counts as a regression')
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else None
+    for name in names or ():
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark {name!r}')
+    radii, counts = ((3, 10), (12, 100)) if args.quick else (RADII, UNIT_COUNTS)
+    results = run_benchmarks(names, radii, counts, args.min_time, args.seed)
+    data = {'environment': environment(), 'results': results}
+    with open(args.out, 'w') as f:
+        json.dump(data, f, indent=2)
+    print(f'\nresults written to {args.out}')
+
+    if args.baseline:
+        if args.save_baseline or not os.path.exists(args.baseline):
+            with open(args.baseline, 'w') as f:
+                json.dump(data, f, indent=2)
+            print(f'baseline saved to {args.baseline}')
+            return 0
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        lines, regressions = compare(results, baseline, args.threshold)
+        print()
+        print('\n'.join(lines))
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) over {args.threshold:.0%}: ' + ', '.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
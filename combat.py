@@ -0,0 +1,123 @@
+# combat.py
+# Exact combat odds for Unit.try_attack: hit chance, damage distribution, kill
+# chance and chance to kill within k attacks, tabulated once for O(1) lookups.
+import math
+
+MAX_ATTACK = 10   # highest attack value tabulated
+MAX_ATTACKS = 5   # kill_within() covers up to this many attacks
+DAMAGE_TAIL = 7   # damage above attack + DAMAGE_TAIL is counted as that much
+
+
+def hit_chance(attacker_hp, attacker_max_hp, defender_hp, forest=False):
+    """Unit.try_attack's hit chance: 0.6, +-0.2 for the hp difference, -0.2 in forest, clamped to 5..95%."""
+    chance = 0.6 + max(-0.2, min(0.2, (attacker_hp - defender_hp) / attacker_max_hp))
+    if forest:
+        chance -= 0.2
+    return max(0.05, min(0.95, chance))
+
+
+def damage_distribution(attack):
+    """P(dmg = d) for d = 0.. of a hit, dmg = max(1, int(gauss(attack, 1)))."""
+    def below(x):
+        # P(gauss(attack, 1) < x)
+        return 0.5 * (1.0 + math.erf((x - attack) / math.sqrt(2.0)))
+    top = attack + DAMAGE_TAIL
+    # int() truncates toward zero, so anything under 2 ends up as 1
+    dist = [0.0, below(2)]
+    for d in range(2, top):
+        dist.append(below(d + 1) - below(d))
+    dist.append(1.0 - below(top))
+    return tuple(dist)
+
+
+class CombatOdds:
+    """Combat odds tables for units with `max_hp` hit points.
+
+    Every (attacker hp, defender hp, attack, forest) combination is filled in
+    once: hit chance, expected hp taken, kill chance and the chance to kill
+    within 1..MAX_ATTACKS attacks. The last one is a dynamic program over the
+    defender's hp, since the hit chance changes as the defender weakens:
+        P_k(h) = p(h) * sum_d P(d) * (1 if d >= h else P_k-1(h - d)) + (1 - p(h)) * P_k-1(h)
+    Queries clamp hp to 0..max_hp and are plain list lookups.
+    """
+
+    def __init__(self, max_hp=10, max_attack=MAX_ATTACK, max_attacks=MAX_ATTACKS):
+        self.max_hp = max_hp
+        self.max_attack = max_attack
+        self.max_attacks = max_attacks
+        self.damage = [damage_distribution(a) for a in range(max_attack + 1)]
+        size = (max_attack + 1) * 2 * (max_hp + 1) * (max_hp + 1)
+        self.hit = [0.0] * size
+        self.expected = [0.0] * size
+        self.kills = [(0.0,) * (max_attacks + 1)] * size  # kills[i][k]: dead within k attacks
+        for attack in range(max_attack + 1):
+            dist = self.damage[attack]
+            # at_least[h]: P(dmg >= h) for a hit
+            at_least = [sum(dist[h:]) for h in range(max_hp + 1)]
+            for forest in (0, 1):
+                for a_hp in range(max_hp + 1):
+                    p = [hit_chance(a_hp, max_hp, h, forest) for h in range(max_hp + 1)]
+                    # kill[k][h]: chance a defender with h hp is dead within k attacks
+                    kill = [[1.0] + [0.0] * max_hp]
+                    for k in range(1, max_attacks + 1):
+                        prev = kill[-1]
+                        row = [1.0]
+                        for h in range(1, max_hp + 1):
+                            survive = sum(dist[d] * prev[h - d] for d in range(1, min(h, len(dist))))
+                            row.append(p[h] * (at_least[h] + survive) + (1 - p[h]) * prev[h])
+                        kill.append(row)
+                    for d_hp in range(max_hp + 1):
+                        i = self._index(a_hp, d_hp, attack, forest)
+                        self.hit[i] = p[d_hp]
+                        self.expected[i] = p[d_hp] * sum(min(d, d_hp) * q for d, q in enumerate(dist))
+                        self.kills[i] = tuple(kill[k][d_hp] for k in range(max_attacks + 1))
+
+    def _index(self, attacker_hp, defender_hp, attack, forest):
+        top = self.max_hp
+        attacker_hp = max(0, min(top, attacker_hp))
+        defender_hp = max(0, min(top, defender_hp))
+        return ((attack * 2 + bool(forest)) * (top + 1) + attacker_hp) * (top + 1) + defender_hp
+
+    def hit_chance(self, attacker_hp, defender_hp, attack, forest=False):
+        return self.hit[self._index(attacker_hp, defender_hp, attack, forest)]
+
+    def expected_damage(self, attacker_hp, defender_hp, attack, forest=False):
+        """Expected hp taken off the defender by one attack (damage past its hp not counted)."""
+        return self.expected[self._index(attacker_hp, defender_hp, attack, forest)]
+
+    def kill_chance(self, attacker_hp, defender_hp, attack, forest=False):
+        return self.kills[self._index(attacker_hp, defender_hp, attack, forest)][1]
+
+    def kill_within(self, k, attacker_hp, defender_hp, attack, forest=False):
+        """Chance the defender is dead after at most k attacks from this attacker."""
+        return self.kills[self._index(attacker_hp, defender_hp, attack, forest)][min(k, self.max_attacks)]
+
+    def damage_range(self, attack, mass=0.9):
+        """Smallest (lo, hi) damage span holding at least `mass` of a hit's damage, centred on the likeliest values."""
+        dist = self.damage[attack]
+        lo = hi = max(range(len(dist)), key=dist.__getitem__)
+        total = dist[lo]
+        while total < mass:
+            if hi + 1 < len(dist) and (lo <= 1 or dist[hi + 1] >= dist[lo - 1]):
+                hi += 1
+                total += dist[hi]
+            else:
+                lo -= 1
+                total += dist[lo]
+        return lo, hi
+
+    def unit_odds(self, attacker, target, forest=False):
+        """(hit chance, expected damage, kill chance) of `attacker` attacking `target` now."""
+        i = self._index(attacker.hp, target.hp, attacker.attack, forest)
+        return self.hit[i], self.expected[i], self.kills[i][1]
+
+
+_odds = {}
+
+
+def combat_odds(max_hp=10):
+    """Shared CombatOdds for units with `max_hp` hit points, built on first use."""
+    odds = _odds.get(max_hp)
+    if odds is None:
+        odds = _odds[max_hp] = CombatOdds(max_hp)
+    return odds
@@ -0,0 +1,249 @@
+# engine.py
+# Pure game-state engine: map, terrain, units, turn phases, victory check and stats.
+# Has no pygame dependency so games can be simulated headless; main.py only renders.
+import random
+from settings import MAP_RADIUS, MAX_UNITS, TERRAIN_FOREST, TERRAIN_ROCK
+from hexgrid import HexGrid
+from entities import Unit, Longbow, UnitRegistry
+from ai import AI_TYPES
+from stats import GameStats
+from replay import Replay
+
+# Game states
+STATE_MENU = 'menu'
+STATE_PLAYING = 'playing'
+STATE_GAMEOVER = 'game_over'
+
+
+# Create basic terrain map: random small patches of forest and a few rocks (obstacles)
+def generate_terrain(coords, rng=random):
+    tmap = {}
+    candidates = list(coords)
+    rng.shuffle(candidates)
+    for i, c in enumerate(candidates[:4]):
+        tmap[c] = TERRAIN_ROCK
+    for j, c in enumerate(candidates[4:10]):
+        if c not in tmap:
+            tmap[c] = TERRAIN_FOREST
+    return tmap
+
+
+# Unit spawning
+def spawn_units(map_coords, stats, max_units=MAX_UNITS, rng=random):
+    units = []
+    spawnable = list(map_coords)
+    rng.shuffle(spawnable)
+    record_unit_lost = stats.record_unit_lost
+    # place simple units first
+    for coord in spawnable:
+        if len(units) >= max_units:
+            break
+        q, r = coord
+        # bias spawn by r coordinate
+        if len([u for u in units if u.owner == 0]) < max_units//2 and r < 1:
+            u = Unit('P', q, r, owner=0, record_unit_lost=record_unit_lost)
+            units.append(u)
+            stats.register_unit(u)
+        elif len([u for u in units if u.owner == 1]) < max_units - max_units//2 and r > -1:
+            u = Unit('E', q, r, owner=1, record_unit_lost=record_unit_lost)
+            units.append(u)
+            stats.register_unit(u)
+    # replace one unit on each side with a Longbow if available
+    for side in [0, 1]:
+        team = [u for u in units if u.owner == side]
+        if team:
+            victim = team[0]
+            units.remove(victim)
+            l = Longbow('L', victim.q, victim.r, owner=side, record_unit_lost=record_unit_lost)
+            units.append(l)
+            stats.register_unit(l)
+    return units
+
+
+def phase_seed(seed, turn, side):
+    # Seed of the game RNG for one phase; distinct for every (round, side) of a game
+    return (seed * 100003 + turn) * 2 + side
+
+
+class GameEngine:
+    """Owns the state of one game and the rules that change it.
+
+    `ai_weights` maps each AI-controlled side (0=player, 1=AI) to the weights file
+    its RLAI loads. The default is the normal human-vs-AI setup; pass both sides
+    for AI-vs-AI games. `ai_types` optionally maps a side to an ai.AI_TYPES name
+    ('simple' by default, or 'mcts'). With an `event_log` (eventlog.EventLog) every game's
+    events are streamed to it.
+
+    Each game draws everything random from its own RNG, seeded from the game's
+    seed; the game seeds come from `seed` (or, without one, from the global
+    random module). Every game is recorded in self.replay (see replay.py).
+    """
+
+    def __init__(self, radius=MAP_RADIUS, max_units=MAX_UNITS, ai_weights=None, event_log=None,
+                 seed=None, keyframe_every=5, ai_types=None):
+        self.radius = radius
+        self.max_units = max_units
+        self.ai_weights = ai_weights if ai_weights is not None else {1: 'rl_weights.json'}
+        self.ai_types = ai_types or {}
+        self.event_log = event_log
+        self.keyframe_every = keyframe_every
+        self.seeds = random.Random(seed if seed is not None else random.getrandbits(64))
+        self.grid = HexGrid(radius)
+        self.map_coords = self.grid  # iterates like the old coord list
+        self.reset()
+
+    def reset(self, seed=None):
+        """Start a fresh game on a new terrain map; `seed` replays a recorded game's setup."""
+        self.seed = seed if seed is not None else self.seeds.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.terrain_map = generate_terrain(self.map_coords, self.rng)
+        self.grid.set_terrain(self.terrain_map)
+        self.stats = GameStats(self.event_log, self.radius, self.max_units, self.terrain_map)
+        self.units = spawn_units(self.map_coords, self.stats, self.max_units, self.rng)
+        # Replays refer to units by their place in the spawn order
+        self.roster = list(self.units)
+        self.roster_index = {u: i for i, u in enumerate(self.roster)}
+        self.replay = Replay(self.seed, self.radius, self.max_units, self.keyframe_every)
+        self.registry = UnitRegistry(self.units)
+        self.ais = {
+            side: AI_TYPES[self.ai_types.get(side, 'simple')](
+                self.units, self.map_coords, self.terrain_map, record_attack=self.record_attack,
+                weights_file=weights_file, owner=side, registry=self.registry, record_move=self.record_move,
+                rng=self.rng)
+            for side, weights_file in self.ai_weights.items()
+        }
+        self.current_turn = 0  # 0=player, 1=ai
+        self.state = STATE_PLAYING
+        self.winner = None
+        self.reset_action_flags(0)
+        self.reset_action_flags(1)
+        self.begin_phase()
+
+    def begin_phase(self):
+        # The RNG is reseeded from (seed, round, side) at the start of every phase,
+        # so a replay can resume at any keyframe without the RNG state before it
+        self.rng.seed(phase_seed(self.seed, self.stats.turns, self.current_turn))
+        if self.current_turn == 0 and self.stats.turns % self.keyframe_every == 0:
+            self.replay.add_keyframe(self.stats.turns, self.snapshot())
+
+    def snapshot(self):
+        """Full game state as plain ints: [round, side, flat unit fields in roster order]."""
+        fields = []
+        for u in self.roster:
+            fields.extend((u.q, u.r, u.hp, int(u.alive), int(u.has_moved), int(u.has_attacked)))
+        return [self.stats.turns, self.current_turn, fields]
+
+    def restore(self, state):
+        """Return to a snapshot() of this game."""
+        self.stats.turns, self.current_turn, fields = state
+        for i, u in enumerate(self.roster):
+            u.q, u.r, u.hp, alive, moved, attacked = fields[6*i:6*i+6]
+            u.alive, u.has_moved, u.has_attacked = bool(alive), bool(moved), bool(attacked)
+        self.units[:] = [u for u in self.roster if u.alive]
+        previous = self.registry
+        self.registry = UnitRegistry(self.units)
+        # Keep the board version rising so reach caches from before the restore go stale
+        self.registry.version += previous.version + 1
+        for ai in self.ais.values():
+            ai.registry = self.registry
+        self.state = STATE_PLAYING
+        self.winner = None
+        self.rng.seed(phase_seed(self.seed, self.stats.turns, self.current_turn))
+
+    def record_move(self, unit, q, r):
+        self.replay.record_move(self.roster_index[unit], q, r)
+        self.stats.record_move(unit, q, r)
+
+    def record_attack(self, owner, hit, dmg, attacker, target):
+        self.replay.record_attack(self.roster_index[attacker], self.roster_index[target])
+        self.stats.record_attack(owner, hit, dmg, attacker, target)
+
+    @property
+    def ai(self):
+        """The AI playing side 1 (the human's opponent)."""
+        return self.ais.get(1)
+
+    def unit_at(self, q, r):
+        return self.registry.at(q, r)
+
+    # Track which units have acted this phase
+    def reset_action_flags(self, owner):
+        for u in self.units:
+            if u.owner == owner and u.alive:
+                u.has_moved = False
+                u.has_attacked = False
+
+    def end_turn(self):
+        """End the current phase and switch sides. A full round ends after the AI phase."""
+        self.replay.record_end_turn()
+        if self.current_turn == 1:
+            self.stats.turns += 1
+        self.current_turn = 1 - self.current_turn
+        self.stats.record_turn(self.current_turn)
+        self.reset_action_flags(self.current_turn)
+        self.begin_phase()
+
+    def move_unit(self, unit, q, r):
+        """Move `unit` to (q, r). Returns an error message, or None on success."""
+        if self.terrain_map.get((q, r)) == TERRAIN_ROCK:
+            return 'Rock blocks movement.'
+        if self.unit_at(q, r):
+            return 'Tile occupied.'
+        unit.move_to(q, r)
+        self.record_move(unit, q, r)
+        unit.has_moved = True
+        return None
+
+    def can_attack(self, attacker, target):
+        if isinstance(attacker, Longbow):
+            return attacker.can_attack(target, self.units, self.terrain_map, self.grid)
+        return self.grid.coord_distance((attacker.q, attacker.r), (target.q, target.r)) <= 1
+
+    def attack(self, attacker, target):
+        """Resolve an attack by a human-controlled unit and record it. Returns (hit, dmg)."""
+        hit, dmg = attacker.try_attack(target, terrain_map=self.terrain_map, stats=self.stats, turn=self.stats.turns,
+                                       rng=self.rng)
+        self.record_attack(attacker.owner, hit, dmg, attacker, target)
+        attacker.has_attacked = True
+        return hit, dmg
+
+    def run_ai_phase(self):
+        """Let the AI for the current side act, then end its phase."""
+        ai = self.ais.get(self.current_turn)
+        if ai:
+            ai.take_actions()
+        self.end_turn()
+
+    def remove_dead(self):
+        # Filter in place so the AIs keep sharing the same list
+        self.units[:] = [u for u in self.units if u.alive]
+
+    def check_victory(self):
+        """Remove dead units and end the game if one side is wiped out.
+        Returns the winner ('Player' or 'AI') the moment the game ends, else None.
+        """
+        self.remove_dead()
+        if self.state != STATE_PLAYING:
+            return None
+        player_alive = self.registry.count(0) > 0
+        ai_alive = self.registry.count(1) > 0
+        if player_alive and ai_alive:
+            return None
+        self.state = STATE_GAMEOVER
+        self.winner = 'Player' if player_alive else 'AI'
+        self.stats.set_winner(self.winner)
+        self.replay.finish(self.winner, self.stats.turns)
+        return self.winner
+
+    def play(self, max_turns=100):
+        """Play AI-vs-AI until one side wins or `max_turns` rounds pass.
+        Returns 'Player', 'AI' or None for a draw.
+        """
+        while self.state == STATE_PLAYING and self.stats.turns < max_turns:
+            self.run_ai_phase()
+            self.check_victory()
+        if self.state == STATE_PLAYING:
+            self.state = STATE_GAMEOVER
+            self.stats.set_winner(None)
+            self.replay.finish(None, self.stats.turns)
+        return self.winner
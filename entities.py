@@ -1,9 +1,76 @@
 # Definitions for characters/units including simple combat logic, animation, and ranged unit.
+# pygame is imported lazily inside the drawing/animation methods so the game
+# logic can run headless (see engine.py).
 import random
-import pygame
-from hexgrid import axial_to_pixel
+from hexgrid import axial_to_pixel, HexGrid, HEX_DIRECTIONS
+from astar import reachable
 from settings import RED, BLUE, BLACK, FOREST, TERRAIN_FOREST, TERRAIN_ROCK
 
+# Stub for the animation queue (see animation.py) - replaced by main.py.
+# Headless games leave it returning None so no animation is posted.
+def animation_queue():
+    return None
+
+# Below this camera zoom the HP numbers no longer fit on the icons
+HP_LABEL_MIN_ZOOM = 0.6
+
+class UnitRegistry:
+    """Index of the living units: coord -> unit, plus a roster per owner.
+    Units registered here keep it up to date through move_to() and on death.
+    Rosters are dicts used as insertion-ordered sets so iteration order is stable.
+    """
+    def __init__(self, units=()):
+        self.by_coord = {}
+        self.by_owner = {0: {}, 1: {}}
+        self.version = 0  # bumped on every add/remove/move so caches can tell the board changed
+        for u in units:
+            if u.alive:
+                self.add(u)
+
+    def add(self, unit):
+        unit.registry = self
+        self.version += 1
+        self.by_coord[(unit.q, unit.r)] = unit
+        self.by_owner.setdefault(unit.owner, {})[unit] = None
+
+    def remove(self, unit):
+        self.version += 1
+        if self.by_coord.get((unit.q, unit.r)) is unit:
+            del self.by_coord[(unit.q, unit.r)]
+        self.by_owner.get(unit.owner, {}).pop(unit, None)
+
+    def move(self, unit, q, r):
+        self.version += 1
+        if self.by_coord.get((unit.q, unit.r)) is unit:
+            del self.by_coord[(unit.q, unit.r)]
+        unit.q, unit.r = q, r
+        self.by_coord[(q, r)] = unit
+
+    def at(self, q, r):
+        return self.by_coord.get((q, r))
+
+    def is_occupied(self, coord):
+        return coord in self.by_coord
+
+    def alive(self, owner):
+        return self.by_owner.get(owner, {}).keys()
+
+    def enemies(self, owner):
+        return [u for side, roster in self.by_owner.items() if side != owner for u in roster]
+
+    def count(self, owner):
+        return len(self.by_owner.get(owner, ()))
+
+    def adjacent_enemies(self, coord, owner):
+        # number of hexes next to coord held by a unit not belonging to owner
+        q, r = coord
+        n = 0
+        for dq, dr in HEX_DIRECTIONS:
+            u = self.by_coord.get((q + dq, r + dr))
+            if u is not None and u.owner != owner:
+                n += 1
+        return n
+
 class Unit:
     # A minimal unit with health, attack, movement, owner (0=player,1=AI)
     _id_counter = 0
@@ -21,12 +88,21 @@ class Unit:
         self.has_moved = False
         self.has_attacked = False
         self.record_unit_lost = record_unit_lost
+        self.registry = None  # set by UnitRegistry.add
+        self._reach_cache = None  # (board key, (costs, parents)) from reachable()
+        self.last_roll = None  # hit roll of the last try_attack
         # Unique ID for per-unit stats
         self.unit_id = Unit._id_counter
         Unit._id_counter += 1
 
-    def pixel_pos(self):
-        return axial_to_pixel(self.q, self.r)
+    def move_to(self, q, r):
+        if self.registry is not None:
+            self.registry.move(self, q, r)
+        else:
+            self.q, self.r = q, r
+
+    def pixel_pos(self, camera=None):
+        return axial_to_pixel(self.q, self.r, camera=camera)
 
     def distance_to(self, other):
         # axial distance via cube coordinates
@@ -36,7 +112,10 @@ class Unit:
         return max(dq, dr, ds)
 
     def possible_moves(self, map_coords, terrain_map=None):
-        # Returns axial coords within move_range and on-map (no pathfinding)
+        # Returns axial coords the unit can move to. On a HexGrid this is a flood fill
+        # with terrain move costs; on a plain coord list, a range test (no pathfinding)
+        if isinstance(map_coords, HexGrid):
+            return self._possible_moves_grid(map_coords, terrain_map)
         results = []
         for (cq, cr) in map_coords:
             dq = abs(self.q - cq)
@@ -51,9 +130,30 @@ class Unit:
                 results.append((cq, cr))
         return results
 
-    def try_attack(self, target, terrain_map=None, stats=None, turn=None):
+    def _possible_moves_grid(self, grid, terrain_map=None):
+        # Hexes reachable within move_range, paying terrain move costs and
+        # routing around rock and occupied hexes
+        costs, _ = self.reachable(grid)
+        return [grid.coords[c] for c in sorted(costs) if costs[c] > 0]
+
+    def reachable(self, grid):
+        """(costs, parents) of the bounded move flood fill from this unit's hex,
+        keyed by cell id (see astar.reachable). Cached until the unit, any other
+        registered unit or the terrain changes."""
+        registry = self.registry
+        key = (self.q, self.r, self.move_range, id(grid), grid.terrain_version,
+               registry.version if registry is not None else None)
+        if self._reach_cache is not None and self._reach_cache[0] == key:
+            return self._reach_cache[1]
+        occupied = registry.by_coord if registry is not None else None
+        result = reachable(grid, grid.cell(self.q, self.r), self.move_range, occupied)
+        self._reach_cache = (key, result)
+        return result
+
+    def try_attack(self, target, terrain_map=None, stats=None, turn=None, rng=random):
         # Probabilistic adjudication: hit chance depends on relative HP, randomness, and terrain
         if not target or not target.alive:
+            self.last_roll = None
             return False, 0
         base_hit = 0.6
         hp_factor = max(-0.2, min(0.2, (self.hp - target.hp) / self.max_hp))
@@ -62,7 +162,8 @@ class Unit:
         if terrain_map and terrain_map.get((target.q, target.r)) == 'forest':
             hit_chance -= 0.2  # 20% harder to hit in forest
         hit_chance = max(0.05, min(0.95, hit_chance))
-        roll = random.random()
+        roll = rng.random()
+        self.last_roll = roll  # kept for the event log
         if stats:
             # Record attack for attacker
             s = stats.unit_stats.get(self.unit_id)
@@ -70,7 +171,7 @@ class Unit:
                 s['attacks'] += 1
         if roll <= hit_chance:
             # damage is probabilistic around attack stat
-            dmg = max(1, int(random.gauss(self.attack, 1)))
+            dmg = max(1, int(rng.gauss(self.attack, 1)))
             target.hp -= dmg
             if stats:
                 # Record hit and damage for attacker
@@ -85,11 +186,12 @@ class Unit:
             if target.hp <= 0 and target.alive:
                 # Play death animation before removing
                 if hasattr(target, 'death_animation'):
-                    import pygame, time
-                    surface = pygame.display.get_surface()
-                    if surface:
-                        target.death_animation(surface)
+                    queue = animation_queue()
+                    if queue is not None:
+                        target.death_animation(queue)
                 target.alive = False
+                if target.registry is not None:
+                    target.registry.remove(target)
                 if stats:
                     t = stats.unit_stats.get(target.unit_id)
                     if t:
@@ -102,82 +204,37 @@ class Unit:
             return True, dmg
         else:
             return False, 0
-    def death_animation(self, surface):
-        # Simple fade out and shrink animation
-        import pygame, time
-        x, y = self.pixel_pos()
-        col = BLUE if self.owner == 0 else RED
-        for i in range(12, 0, -2):
-            surface_copy = surface.copy()
-            pygame.draw.circle(surface_copy, col, (x, y), i)
-            pygame.display.flip()
-            time.sleep(0.03)
-        # Final frame: erase
-        pygame.draw.circle(surface, (0,0,0), (x, y), 14)
-        pygame.display.flip()
-        time.sleep(0.02)
-
-    def animate_attack(self, surface, target, font, shake_intensity=6, flashes=2):
+    def death_animation(self, queue):
+        # Simple fade out and shrink animation, posted to the frame-driven queue
+        from animation import DeathFade
+        queue.post(DeathFade((self.q, self.r), self.owner))
+
+    def animate_attack(self, queue, target, shake_intensity=6, flashes=2):
         """Simple flash and shake animation when this unit attacks a target.
-        Simple and effective for prototype; will update with something cooler later.
+        Posted to the animation queue; returns immediately.
         """
-        import time
-        orig_surf = surface.copy()
-        sx, sy = self.pixel_pos()
-        tx, ty = target.pixel_pos()
-
-        for i in range(flashes):
-            # flash attacker and target by drawing white circles behind them
-            surface.blit(orig_surf, (0,0))
-            pygame.draw.circle(surface, (255,255,255), (sx, sy), 18)
-            pygame.draw.circle(surface, (255,255,255), (tx, ty), 18)
-            pygame.display.flip()
-            time.sleep(0.06)
-            # small shake
-            for _ in range(3):
-                surface.blit(orig_surf, (0,0))
-                ox = random.randint(-shake_intensity, shake_intensity)
-                oy = random.randint(-shake_intensity, shake_intensity)
-                # draw both units offset
-                col_s = BLUE if self.owner == 0 else RED
-                col_t = BLUE if target.owner == 0 else RED
-                pygame.draw.circle(surface, col_s, (sx + ox, sy + oy), 14)
-                pygame.draw.circle(surface, col_t, (tx + -ox, ty + -oy), 14)
-                # damage text
-                pygame.display.flip()
-                time.sleep(0.03)
-        # restore
-        surface.blit(orig_surf, (0,0))
-        pygame.display.flip()
-
-    def draw(self, surface, font):
-        x, y = self.pixel_pos()
+        from animation import AttackFlash
+        queue.post(AttackFlash((self.q, self.r), (target.q, target.r), self.owner, target.owner,
+                               shake_intensity, flashes))
+
+    def draw(self, surface, font, camera=None):
+        import pygame
+        from ui import render_text
+        x, y = self.pixel_pos(camera)
+        zoom = camera.zoom if camera is not None else 1
         col = BLUE if self.owner == 0 else RED
         # draw a filled circle inside the hex for unit
-        pygame.draw.circle(surface, col, (x, y), 14)
-        txt = font.render(str(self.hp), True, BLACK)
-        surface.blit(txt, (x - txt.get_width()//2, y - txt.get_height()//2))
+        pygame.draw.circle(surface, col, (x, y), max(2, int(14 * zoom)))
+        if zoom >= HP_LABEL_MIN_ZOOM:
+            txt = render_text(font, str(self.hp), BLACK)
+            surface.blit(txt, (x - txt.get_width()//2, y - txt.get_height()//2))
 
 # Longbow special unit
 class Longbow(Unit):
-    def death_animation(self, surface):
+    def death_animation(self, queue):
         # Fade out and shrink triangle
-        import pygame, time
-        x, y = self.pixel_pos()
-        col = BLUE if self.owner == 0 else RED
-        for i in range(12, 0, -2):
-            surface_copy = surface.copy()
-            if self.owner == 0:
-                pts = [(x, y-i), (x-i, y+i), (x+i, y+i)]
-            else:
-                pts = [(x, y+i), (x-i, y-i), (x+i, y-i)]
-            pygame.draw.polygon(surface_copy, col, pts)
-            pygame.display.flip()
-            time.sleep(0.03)
-        # Final frame: erase
-        pygame.draw.circle(surface, (0,0,0), (x, y), 14)
-        pygame.display.flip()
-        time.sleep(0.02)
+        from animation import DeathFade
+        queue.post(DeathFade((self.q, self.r), self.owner, 'up' if self.owner == 0 else 'down'))
     """Ranged unit. Can attack at a distance if line of sight is clear.
     It is represented as a triangle icon.
     """
@@ -186,8 +243,12 @@ class Longbow(Unit):
         self.attack = 3
         self.range = 3
 
-    def has_line_of_sight(self, target, units, terrain_map=None):
+    def has_line_of_sight(self, target, units, terrain_map=None, grid=None):
         # LOS only allowed along straight axial lines (q, r, or s-axis)
+        if grid is not None:
+            # Precomputed rays; the grid's terrain array mirrors terrain_map
+            return grid.line_of_sight(self.range).is_clear((self.q, self.r), (target.q, target.r),
+                                                           self._occupied(units))
         dq = target.q - self.q
         dr = target.r - self.r
         ds = -dq-dr
@@ -205,23 +266,47 @@ class Longbow(Unit):
             if terrain_map and terrain_map.get((cq, cr)) == TERRAIN_ROCK:
                 return False
             # unit blocking
-            if any(u.alive and u.q == cq and u.r == cr for u in units):
+            if self.registry is not None:
+                if self.registry.is_occupied((cq, cr)):
+                    return False
+            elif any(u.alive and u.q == cq and u.r == cr for u in units):
                 return False
         return True
 
-    def can_attack(self, target, units, terrain_map=None):
+    def can_attack(self, target, units, terrain_map=None, grid=None):
         return (self.alive and target.alive and self.distance_to(target) <= self.range
-                and self.has_line_of_sight(target, units, terrain_map))
+                and self.has_line_of_sight(target, units, terrain_map, grid))
+
+    def visible_targets(self, units, grid):
+        """All living enemy units this Longbow can shoot from its hex, in one table lookup."""
+        occupied = self._occupied(units)
+        targets = []
+        for coord in grid.line_of_sight(self.range).visible((self.q, self.r), occupied):
+            u = occupied.get(coord)
+            if u is not None and u.owner != self.owner:
+                targets.append(u)
+        return targets
+
+    def _occupied(self, units):
+        # coord -> unit index of the living units
+        if self.registry is not None:
+            return self.registry.by_coord
+        return {(u.q, u.r): u for u in units if u.alive}
 
-    def draw(self, surface, font):
-        x, y = self.pixel_pos()
+    def draw(self, surface, font, camera=None):
+        import pygame
+        from ui import render_text
+        x, y = self.pixel_pos(camera)
+        zoom = camera.zoom if camera is not None else 1
+        h, w = max(2, int(12 * zoom)), max(2, int(10 * zoom))
         # triangle pointing up for player (blue), down for AI (red)
         if self.owner == 0:
-            pts = [(x, y-12), (x-10, y+10), (x+10, y+10)]
+            pts = [(x, y-h), (x-w, y+w), (x+w, y+w)]
             col = BLUE
         else:
-            pts = [(x, y+12), (x-10, y-10), (x+10, y-10)]
+            pts = [(x, y+h), (x-w, y-w), (x+w, y-w)]
             col = RED
         pygame.draw.polygon(surface, col, pts)
-        txt = font.render(str(self.hp), True, BLACK)
-        surface.blit(txt, (x - txt.get_width()//2, y - txt.get_height()//2))
+        if zoom >= HP_LABEL_MIN_ZOOM:
+            txt = render_text(font, str(self.hp), BLACK)
+            surface.blit(txt, (x - txt.get_width()//2, y - txt.get_height()//2))
@@ -0,0 +1,234 @@
+# eventlog.py
+# Streaming, append-only match event log (JSONL or compact binary) and summaries derived from it.
+# Usage: python eventlog.py tinyhex_events.jsonl [--games]
+import argparse
+import json
+import os
+import struct
+
+# Event kinds. Every event is a tuple (kind, game, turn, *fields) with the fields below.
+GAME_START, SPAWN, MOVE, ATTACK, DEATH, TURN, GAME_END = range(7)
+EVENT_NAMES = ('game_start', 'spawn', 'move', 'attack', 'death', 'turn', 'game_end')
+EVENT_FIELDS = (
+    ('radius', 'max_units'),
+    ('unit', 'owner', 'archer', 'q', 'r', 'max_hp'),
+    ('unit', 'owner', 'q', 'r'),
+    ('unit', 'owner', 'target', 'hit', 'damage', 'forest', 'roll'),  # roll is -1 if the target was already dead
+    ('unit', 'owner', 'q', 'r'),
+    ('side',),
+    ('winner',),  # 0 = player side, 1 = AI side, -1 = draw
+)
+WINNER_CODES = {'Player': 0, 'AI': 1, None: -1}
+
+# Binary records: kind, game, turn, six int fields and one float (the attack roll)
+RECORD = struct.Struct('<BIH6if')
+
+
+def _pack(event):
+    kind, game, turn = event[:3]
+    fields = event[3:]
+    roll = 0.0
+    if kind == ATTACK:
+        roll = fields[-1]
+        fields = fields[:-1]
+    return RECORD.pack(kind, game, turn, *fields, *(0,) * (6 - len(fields)), roll)
+
+
+def _unpack(record):
+    kind, game, turn, *ints, roll = RECORD.unpack(record)
+    n = len(EVENT_FIELDS[kind])
+    if kind == ATTACK:
+        return (kind, game, turn, *ints[:n - 1], roll)
+    return (kind, game, turn, *ints[:n])
+
+
+def _encode_json(event):
+    kind = event[0]
+    d = {'event': EVENT_NAMES[kind], 'game': event[1], 'turn': event[2]}
+    d.update(zip(EVENT_FIELDS[kind], event[3:]))
+    return json.dumps(d, separators=(',', ':'))
+
+
+def _decode_json(line):
+    d = json.loads(line)
+    kind = EVENT_NAMES.index(d['event'])
+    return (kind, d['game'], d['turn']) + tuple(d[f] for f in EVENT_FIELDS[kind])
+
+
+def is_binary(path):
+    return path.endswith('.bin')
+
+
+class EventLog:
+    """Append-only event log. emit() only appends a tuple to a buffer; the buffer
+    is encoded and written in one go every `batch_size` events and on close().
+    Paths ending in .bin get fixed-size binary records, anything else JSONL.
+    """
+
+    def __init__(self, path, batch_size=4096):
+        self.path = path
+        self.binary = is_binary(path)
+        self.batch_size = batch_size
+        self.buffer = []
+        self.events = 0
+        self._next_game = last_game_id(path) + 1
+        self._file = open(path, 'ab' if self.binary else 'a', encoding=None if self.binary else 'utf-8')
+
+    def new_game(self):
+        """Game id for the next game, continuing after the games already in the file."""
+        game = self._next_game
+        self._next_game += 1
+        return game
+
+    def emit(self, kind, game, turn, *fields):
+        self.buffer.append((kind, game, turn) + fields)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            if self.binary:
+                self._file.write(b''.join(map(_pack, self.buffer)))
+            else:
+                self._file.write('\n'.join(map(_encode_json, self.buffer)) + '\n')
+            self.events += len(self.buffer)
+            self.buffer = []
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def last_game_id(path):
+    """Id of the last game in an existing log, or -1 for a new or empty file."""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return -1
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        if is_binary(path):
+            f.seek(size - size % RECORD.size - RECORD.size)
+            return _unpack(f.read(RECORD.size))[1]
+        f.seek(max(0, size - 4096))
+        lines = f.read().splitlines()
+    for line in reversed(lines):
+        try:
+            return _decode_json(line)[1]
+        except (ValueError, KeyError):
+            continue  # partial line at the start of the tail
+    return -1
+
+
+def read_events(path):
+    """Yield the event tuples stored in a log file, in order."""
+    if is_binary(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        end = len(data) - len(data) % RECORD.size
+        for i in range(0, end, RECORD.size):
+            yield _unpack(data[i:i + RECORD.size])
+    else:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield _decode_json(line)
+
+
+def event_dict(event):
+    """Event tuple as a dict with named fields."""
+    kind = event[0]
+    d = {'event': EVENT_NAMES[kind], 'game': event[1], 'turn': event[2]}
+    d.update(zip(EVENT_FIELDS[kind], event[3:]))
+    return d
+
+
+def summarize(events):
+    """Per-game summaries rebuilt from the events, with the keys of
+    GameStats.summary() (except duration) plus per-unit totals.
+    Returns {game: summary}.
+    """
+    games = {}
+    for event in events:
+        kind, game, turn = event[:3]
+        g = games.get(game)
+        if g is None:
+            g = games[game] = {
+                'turns': 0,
+                'player_attacks': 0, 'player_hits': 0, 'player_damage': 0, 'player_units_lost': 0,
+                'ai_attacks': 0, 'ai_hits': 0, 'ai_damage': 0, 'ai_units_lost': 0,
+                'winner': None, 'units': {},
+            }
+        g['turns'] = max(g['turns'], turn)
+        if kind == SPAWN:
+            unit, owner, archer, q, r, max_hp = event[3:]
+            g['units'][unit] = {
+                'unit_id': unit, 'type': 'Archer' if archer else 'Ground',
+                'owner': 'Player' if owner == 0 else 'AI', 'spawn_q': q, 'spawn_r': r, 'max_hp': max_hp,
+                'attacks': 0, 'hits': 0, 'damage_dealt': 0, 'damage_taken': 0, 'moves': 0,
+                'turn_spawned': turn, 'turn_killed': None, 'final_q': q, 'final_r': r, 'alive': True,
+            }
+        elif kind == MOVE:
+            unit, owner, q, r = event[3:]
+            u = g['units'].get(unit)
+            if u:
+                u['moves'] += 1
+                u['final_q'], u['final_r'] = q, r
+        elif kind == ATTACK:
+            unit, owner, target, hit, dmg, forest, roll = event[3:]
+            side = 'player' if owner == 0 else 'ai'
+            g[side + '_attacks'] += 1
+            if hit:
+                g[side + '_hits'] += 1
+                g[side + '_damage'] += dmg
+            u, t = g['units'].get(unit), g['units'].get(target)
+            if u:
+                u['attacks'] += 1
+                if hit:
+                    u['hits'] += 1
+                    u['damage_dealt'] += dmg
+            if t and hit:
+                t['damage_taken'] += dmg
+        elif kind == DEATH:
+            unit, owner, q, r = event[3:]
+            g['player_units_lost' if owner == 0 else 'ai_units_lost'] += 1
+            u = g['units'].get(unit)
+            if u:
+                u.update(alive=False, turn_killed=turn, final_q=q, final_r=r)
+        elif kind == GAME_END:
+            g['winner'] = {0: 'Player', 1: 'AI'}.get(event[3])
+    return games
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize a TinyHex event log.')
+    parser.add_argument('log', help='.jsonl or .bin event log')
+    parser.add_argument('--games', action='store_true', help='print one line per game')
+    args = parser.parse_args(argv)
+    games = summarize(read_events(args.log))
+    totals = {}
+    for game, s in games.items():
+        if args.games:
+            print(f"game {game}: winner={s['winner']} turns={s['turns']} "
+                  f"player {s['player_hits']}/{s['player_attacks']} hits, ai {s['ai_hits']}/{s['ai_attacks']} hits")
+        for k, v in s.items():
+            if isinstance(v, int):
+                totals[k] = totals.get(k, 0) + v
+    wins = {}
+    for s in games.values():
+        wins[s['winner']] = wins.get(s['winner'], 0) + 1
+    print(f'games: {len(games)}')
+    print(f"side0_wins: {wins.get('Player', 0)}  side1_wins: {wins.get('AI', 0)}  draws: {wins.get(None, 0)}")
+    for k, v in totals.items():
+        print(f'{k}: {v}')
+    return games
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+# gamestate.py
+# Compact game state for search and bulk simulation: unit fields in typed arrays,
+# O(units) clone and O(1) make/unmake of moves, attacks and phase ends, with an
+# incrementally updated Zobrist key.
+from array import array
+from hexgrid import FOREST_CODE
+from astar import reachable
+from zobrist import keys_for
+
+# Undo record kinds
+_MOVE, _ATTACK, _END_PHASE = range(3)
+
+
+class _OccupiedCoords:
+    # Coord-keyed view of a cell -> unit occupancy dict, for the grid helpers
+    __slots__ = ('index', 'occ')
+
+    def __init__(self, index, occ):
+        self.index = index
+        self.occ = occ
+
+    def __contains__(self, coord):
+        cell = self.index.get(coord)
+        return cell is not None and cell in self.occ
+
+    def __bool__(self):
+        return bool(self.occ)
+
+
+class GameState:
+    """Struct-of-arrays copy of a game's units on a HexGrid.
+
+    Unit i (roster order) has its cell id, hp and alive flag in typed arrays;
+    owner, kind, attack, max_hp, move_range and range never change during a
+    game and are shared by every clone. Action flags are phase stamps
+    (has_moved is `moved[i] == phase`), so ending a phase resets every flag
+    in O(1).
+
+    move(), attack() and end_phase() push an undo record and undo() pops one,
+    all in O(1). Dice are not part of the state: roll_attack() draws an outcome
+    exactly like Unit.try_attack and attack() applies it.
+
+    `key` is the position's Zobrist key (see zobrist.py), kept up to date by
+    the same calls. Flag keys are XORed into `flag_key` as well, so
+    end_phase() clears them all at once.
+    """
+
+    __slots__ = ('grid', 'owner', 'kind', 'attack_value', 'max_hp', 'move_range', 'range', 'unit_ids',
+                 'cell', 'hp', 'alive', 'moved', 'attacked', 'occ', 'counts', 'side', 'turn', 'phase',
+                 'history', 'keys', 'key', 'flag_key')
+
+    def __init__(self, grid, units, side=0, turn=0):
+        self.grid = grid
+        self.owner = array('b', (u.owner for u in units))
+        self.kind = array('b', (int(hasattr(u, 'range')) for u in units))  # 0 ground, 1 archer
+        self.attack_value = array('h', (u.attack for u in units))
+        self.max_hp = array('h', (u.max_hp for u in units))
+        self.move_range = array('b', (u.move_range for u in units))
+        self.range = array('b', (getattr(u, 'range', 1) for u in units))
+        self.unit_ids = tuple(u.unit_id for u in units)
+        self.cell = array('i', (grid.index[(u.q, u.r)] for u in units))
+        self.hp = array('h', (u.hp for u in units))
+        self.alive = array('b', (int(u.alive) for u in units))
+        self.side = side
+        self.turn = turn
+        self.phase = 0
+        self.moved = array('i', (0 if u.has_moved else -1 for u in units))
+        self.attacked = array('i', (0 if u.has_attacked else -1 for u in units))
+        self.occ = {self.cell[i]: i for i in range(len(units)) if self.alive[i]}
+        self.counts = [0, 0]
+        for i in self.occ.values():
+            self.counts[self.owner[i]] += 1
+        self.history = []
+        self.keys = keys_for(len(grid.coords), max(self.max_hp, default=1))
+        self.key, self.flag_key = self.compute_key()
+
+    @classmethod
+    def from_engine(cls, engine):
+        """State of a GameEngine's game, units in roster order."""
+        return cls(engine.grid, engine.roster, engine.current_turn, engine.stats.turns)
+
+    def clone(self):
+        """Independent copy of the position (the undo history is not copied)."""
+        new = GameState.__new__(GameState)
+        for name in ('grid', 'owner', 'kind', 'attack_value', 'max_hp', 'move_range', 'range', 'unit_ids',
+                     'side', 'turn', 'phase', 'keys', 'key', 'flag_key'):
+            setattr(new, name, getattr(self, name))
+        new.cell = self.cell[:]
+        new.hp = self.hp[:]
+        new.alive = self.alive[:]
+        new.moved = self.moved[:]
+        new.attacked = self.attacked[:]
+        new.occ = self.occ.copy()
+        new.counts = self.counts[:]
+        new.history = []
+        return new
+
+    def __len__(self):
+        return len(self.cell)
+
+    # Queries
+    def coord(self, i):
+        return self.grid.coords[self.cell[i]]
+
+    def at(self, cell):
+        """Index of the living unit on `cell`, or None."""
+        return self.occ.get(cell)
+
+    def has_moved(self, i):
+        return self.moved[i] == self.phase
+
+    def has_attacked(self, i):
+        return self.attacked[i] == self.phase
+
+    def living(self, owner):
+        return [i for i in self.occ.values() if self.owner[i] == owner]
+
+    def winner(self):
+        """0 or 1 once the other side has no units left, else None."""
+        if self.counts[1] == 0:
+            return 0
+        if self.counts[0] == 0:
+            return 1
+        return None
+
+    def distance(self, i, j):
+        return self.grid.distance(self.cell[i], self.cell[j])
+
+    def compute_key(self):
+        """(key, flag_key) of the position worked out from scratch."""
+        keys = self.keys
+        key = flags = 0
+        for cell, i in self.occ.items():
+            key ^= keys.piece_key(cell, self.owner[i], self.kind[i], self.hp[i])
+            if self.moved[i] == self.phase:
+                flags ^= keys.moved[cell]
+            if self.attacked[i] == self.phase:
+                flags ^= keys.attacked[cell]
+        if self.side == 1:
+            key ^= keys.side
+        return key ^ flags, flags
+
+    def decision_key(self, i):
+        """Key of the position with unit i to act next."""
+        return self.key ^ self.keys.actor[self.cell[i]]
+
+    def occupied(self):
+        """The living units' hexes as a container of coords."""
+        return _OccupiedCoords(self.grid.index, self.occ)
+
+    def moves(self, i):
+        """Cells unit i can move to: the same flood fill as Unit.possible_moves."""
+        costs, _ = reachable(self.grid, self.cell[i], self.move_range[i], self.occupied())
+        return [c for c in sorted(costs) if costs[c] > 0]
+
+    def can_attack(self, i, j):
+        """Same rule as GameEngine.can_attack: adjacent, or within range and clear
+        line of sight for archers."""
+        if not (self.alive[i] and self.alive[j]):
+            return False
+        d = self.distance(i, j)
+        if not self.kind[i]:
+            return d <= 1
+        if d > self.range[i]:
+            return False
+        grid = self.grid
+        return grid.line_of_sight(self.range[i]).is_clear(self.coord(i), self.coord(j), self.occupied())
+
+    def targets(self, i):
+        """Enemy units unit i can attack from where it stands."""
+        grid = self.grid
+        owner = self.owner[i]
+        occ = self.occ
+        if self.kind[i]:
+            index = grid.index
+            cells = (index[c] for c in grid.line_of_sight(self.range[i]).visible(self.coord(i), self.occupied()))
+        else:
+            cells = grid.neighbor_ids(self.cell[i])
+        return [j for j in (occ.get(c) for c in cells) if j is not None and self.owner[j] != owner]
+
+    def hit_chance(self, i, j):
+        """Chance that unit i hits unit j (Unit.try_attack's formula)."""
+        hp_factor = max(-0.2, min(0.2, (self.hp[i] - self.hp[j]) / self.max_hp[i]))
+        chance = 0.6 + hp_factor
+        if self.grid.terrain[self.cell[j]] == FOREST_CODE:
+            chance -= 0.2
+        return max(0.05, min(0.95, chance))
+
+    def roll_attack(self, i, j, rng):
+        """Draw (hit, dmg) for unit i attacking unit j, using rng exactly as
+        Unit.try_attack does. The state is not changed."""
+        if not self.alive[j]:
+            return False, 0
+        if rng.random() <= self.hit_chance(i, j):
+            return True, max(1, int(rng.gauss(self.attack_value[i], 1)))
+        return False, 0
+
+    # Make / unmake
+    def move(self, i, cell):
+        occ = self.occ
+        keys = self.keys
+        old = self.cell[i]
+        self.history.append((_MOVE, i, old, self.moved[i], self.key, self.flag_key))
+        del occ[old]
+        occ[cell] = i
+        self.cell[i] = cell
+        row = keys.row(self.owner[i], self.kind[i], self.hp[i])
+        piece, stride = keys.piece, keys.stride
+        phase = self.phase
+        flags = keys.moved[cell]
+        if self.moved[i] == phase:
+            flags ^= keys.moved[old]
+        if self.attacked[i] == phase:
+            flags ^= keys.attacked[old] ^ keys.attacked[cell]
+        self.key ^= piece[old * stride + row] ^ piece[cell * stride + row] ^ flags
+        self.flag_key ^= flags
+        self.moved[i] = phase
+
+    def attack(self, i, j, dmg):
+        """Apply an attack by unit i on unit j that did `dmg` damage (0 for a miss)."""
+        keys = self.keys
+        self.history.append((_ATTACK, i, j, self.hp[j], self.alive[j], self.attacked[i], self.key, self.flag_key))
+        if self.attacked[i] != self.phase:
+            flag = keys.attacked[self.cell[i]]
+            self.key ^= flag
+            self.flag_key ^= flag
+        self.attacked[i] = self.phase
+        if dmg and self.alive[j]:
+            cell = self.cell[j]
+            owner, kind = self.owner[j], self.kind[j]
+            self.key ^= keys.piece_key(cell, owner, kind, self.hp[j])
+            self.hp[j] -= dmg
+            if self.hp[j] > 0:
+                self.key ^= keys.piece_key(cell, owner, kind, self.hp[j])
+            else:
+                # The dead leave the key along with their flags
+                flags = 0
+                if self.moved[j] == self.phase:
+                    flags ^= keys.moved[cell]
+                if self.attacked[j] == self.phase:
+                    flags ^= keys.attacked[cell]
+                self.key ^= flags
+                self.flag_key ^= flags
+                self.alive[j] = 0
+                del self.occ[cell]
+                self.counts[owner] -= 1
+        elif dmg:
+            self.hp[j] -= dmg
+
+    def end_phase(self):
+        """Switch sides; a round ends after side 1. Every action flag resets."""
+        self.history.append((_END_PHASE, self.side, self.turn, self.key, self.flag_key))
+        if self.side == 1:
+            self.turn += 1
+        self.side = 1 - self.side
+        self.phase += 1
+        self.key ^= self.flag_key ^ self.keys.side
+        self.flag_key = 0
+
+    def undo(self):
+        """Take back the last move(), attack() or end_phase()."""
+        record = self.history.pop()
+        kind = record[0]
+        self.key, self.flag_key = record[-2:]
+        if kind == _MOVE:
+            _, i, old, moved, _, _ = record
+            del self.occ[self.cell[i]]
+            self.occ[old] = i
+            self.cell[i] = old
+            self.moved[i] = moved
+        elif kind == _ATTACK:
+            _, i, j, hp, alive, attacked, _, _ = record
+            if alive and not self.alive[j]:
+                self.occ[self.cell[j]] = j
+                self.counts[self.owner[j]] += 1
+            self.hp[j] = hp
+            self.alive[j] = alive
+            self.attacked[i] = attacked
+        else:
+            _, self.side, self.turn, _, _ = record
+            self.phase -= 1
+
+    # Interchange with GameEngine
+    def snapshot(self):
+        """The position in GameEngine.snapshot() form, for GameEngine.restore()."""
+        fields = []
+        for i in range(len(self.cell)):
+            q, r = self.grid.coords[self.cell[i]]
+            fields.extend((q, r, self.hp[i], self.alive[i],
+                           int(self.moved[i] == self.phase), int(self.attacked[i] == self.phase)))
+        return [self.turn, self.side, fields]
+
+    def load(self, state):
+        """Take the position from a GameEngine.snapshot() of the same game."""
+        self.turn, self.side, fields = state
+        index = self.grid.index
+        self.phase = 0
+        self.occ = {}
+        self.counts = [0, 0]
+        for i in range(len(self.cell)):
+            q, r, hp, alive, moved, attacked = fields[6*i:6*i+6]
+            self.cell[i] = index[(q, r)]
+            self.hp[i] = hp
+            self.alive[i] = alive
+            self.moved[i] = 0 if moved else -1
+            self.attacked[i] = 0 if attacked else -1
+            if alive:
+                self.occ[self.cell[i]] = i
+                self.counts[self.owner[i]] += 1
+        self.history = []
+        self.key, self.flag_key = self.compute_key()
+
+    # Unit-like views
+    def unit(self, i):
+        return (ArcherView if self.kind[i] else UnitView)(self, i)
+
+    def units(self, owner=None):
+        """Views of the living units (of one side if `owner` is given), in roster order."""
+        return [self.unit(i) for i in sorted(self.occ.values()) if owner is None or self.owner[i] == owner]
+
+
+class UnitView:
+    """Read-only Unit-like view of one unit in a GameState."""
+
+    __slots__ = ('state', 'index')
+
+    def __init__(self, state, index):
+        self.state = state
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, UnitView) and other.state is self.state and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.state), self.index))
+
+    @property
+    def q(self):
+        return self.state.coord(self.index)[0]
+
+    @property
+    def r(self):
+        return self.state.coord(self.index)[1]
+
+    @property
+    def hp(self):
+        return self.state.hp[self.index]
+
+    @property
+    def max_hp(self):
+        return self.state.max_hp[self.index]
+
+    @property
+    def attack(self):
+        return self.state.attack_value[self.index]
+
+    @property
+    def move_range(self):
+        return self.state.move_range[self.index]
+
+    @property
+    def owner(self):
+        return self.state.owner[self.index]
+
+    @property
+    def alive(self):
+        return bool(self.state.alive[self.index])
+
+    @property
+    def has_moved(self):
+        return self.state.has_moved(self.index)
+
+    @property
+    def has_attacked(self):
+        return self.state.has_attacked(self.index)
+
+    @property
+    def unit_id(self):
+        return self.state.unit_ids[self.index]
+
+    def distance_to(self, other):
+        dq = abs(self.q - other.q)
+        dr = abs(self.r - other.r)
+        ds = abs((-self.q-self.r) - (-other.q-other.r))
+        return max(dq, dr, ds)
+
+
+class ArcherView(UnitView):
+    # Code that tells archers apart with hasattr(u, 'range') keeps working on views
+    __slots__ = ()
+
+    @property
+    def range(self):
+        return self.state.range[self.index]
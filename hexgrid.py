@@ -1,16 +1,120 @@
 # Hex grid logic and drawing helpers. Uses axial coordinates (q, r).
 import math
-import pygame
-from settings import HEX_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, FOREST, ROCK, TAN, TERRAIN_FOREST, TERRAIN_ROCK
+from array import array
+from settings import HEX_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, FOREST, ROCK, TAN, TERRAIN_PLAIN, TERRAIN_FOREST, TERRAIN_ROCK
 
-# Convert axial (q, r) to pixel coordinates (x, y) for pointy-top hexes
-def axial_to_pixel(q, r, size=HEX_SIZE, origin=None):
+# Axial neighbor offsets, in the order A* expands them
+HEX_DIRECTIONS = [(1,0), (1,-1), (0,-1), (-1,0), (-1,1), (0,1)]
+
+# Integer terrain codes used by HexGrid.terrain
+PLAIN, FOREST_CODE, ROCK_CODE = 0, 1, 2
+TERRAIN_CODES = {TERRAIN_PLAIN: PLAIN, TERRAIN_FOREST: FOREST_CODE, TERRAIN_ROCK: ROCK_CODE}
+
+# Convert axial (q, r) to pixel coordinates (x, y) for pointy-top hexes.
+# A camera, when given, supplies the size and origin.
+def axial_to_pixel(q, r, size=HEX_SIZE, origin=None, camera=None):
+    if camera is not None:
+        size, origin = camera.hex_size, camera.origin
     if origin is None:
         origin = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
     x = size * (math.sqrt(3) * q + math.sqrt(3)/2 * r) + origin[0]
     y = size * (3/2 * r) + origin[1]
     return (int(x), int(y))
 
+# Inverse of axial_to_pixel: the hex containing pixel (x, y), as rounded axial (q, r)
+def pixel_to_axial(x, y, size=HEX_SIZE, origin=None, camera=None):
+    if camera is not None:
+        size, origin = camera.hex_size, camera.origin
+    if origin is None:
+        origin = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+    px = (x - origin[0]) / size
+    py = (y - origin[1]) / size
+    q = math.sqrt(3)/3 * px - 1/3 * py
+    r = 2/3 * py
+    return axial_round(q, r)
+
+# Round fractional axial coords to the nearest hex via cube coordinates
+def axial_round(q, r):
+    s = -q - r
+    rq, rr, rs = round(q), round(r), round(s)
+    dq, dr, ds = abs(rq - q), abs(rr - r), abs(rs - s)
+    if dq > dr and dq > ds:
+        rq = -rr - rs
+    elif dr > ds:
+        rr = -rq - rs
+    return (int(rq), int(rr))
+
+class Camera:
+    """View onto the map: (x, y) is the world point shown at the screen
+    center, in unzoomed pixels from the map center, and zoom scales HEX_SIZE.
+    The default camera reproduces the fixed screen-centered view."""
+    MIN_ZOOM = 0.2
+    MAX_ZOOM = 3.0
+
+    def __init__(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT, x=0, y=0, zoom=1.0):
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.zoom = zoom
+
+    @property
+    def hex_size(self):
+        return HEX_SIZE * self.zoom
+
+    @property
+    def origin(self):
+        # Screen position of axial (0, 0)
+        return (self.width // 2 - self.x * self.zoom, self.height // 2 - self.y * self.zoom)
+
+    @property
+    def key(self):
+        # Changes whenever the view does; used to invalidate cached drawing
+        return (self.x, self.y, self.zoom, self.width, self.height)
+
+    def pan(self, dx, dy):
+        # Move the view by (dx, dy) screen pixels
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+
+    def zoom_at(self, factor, sx, sy):
+        """Zoom by `factor`, keeping the world point under screen (sx, sy) fixed."""
+        zoom = max(self.MIN_ZOOM, min(self.MAX_ZOOM, self.zoom * factor))
+        ox, oy = self.origin
+        wx, wy = (sx - ox) / self.zoom, (sy - oy) / self.zoom
+        self.zoom = zoom
+        self.x = wx - (sx - self.width // 2) / zoom
+        self.y = wy - (sy - self.height // 2) / zoom
+
+    def visible(self, coords, margin=1):
+        """Map coords on screen, sorted like generate_hex_map. The candidate
+        range is derived from the viewport in hex space, so the cost scales with
+        the visible hexes rather than the map size."""
+        if not isinstance(coords, (HexGrid, set, frozenset, dict)):
+            coords = set(coords)
+        size = self.hex_size
+        ox, oy = self.origin
+        row_h = 1.5 * size
+        col_w = math.sqrt(3) * size
+        r_min = math.floor(-oy / row_h) - margin
+        r_max = math.ceil((self.height - oy) / row_h) + margin
+        if isinstance(coords, HexGrid):
+            r_min, r_max = max(r_min, -coords.radius), min(r_max, coords.radius)
+        out = []
+        for r in range(r_min, r_max + 1):
+            q_min = math.floor(-ox / col_w - r / 2) - margin
+            q_max = math.ceil((self.width - ox) / col_w - r / 2) + margin
+            for q in range(q_min, q_max + 1):
+                if (q, r) in coords:
+                    out.append((q, r))
+        out.sort()
+        return out
+
+    def on_screen(self, q, r, margin=None):
+        x, y = axial_to_pixel(q, r, camera=self)
+        m = self.hex_size if margin is None else margin
+        return -m <= x <= self.width + m and -m <= y <= self.height + m
+
 # Get polygon points for a hex centered at pixel (x, y)
 def hex_corners(x, y, size=HEX_SIZE):
     points = []
@@ -31,19 +135,178 @@ def generate_hex_map(radius):
             coords.append((q, r))
     return coords
 
+class HexGrid:
+    """Array-backed topology for a hex-shaped map of the given radius.
+
+    Cells get dense integer ids in generate_hex_map order (sorted by (q, r)), so
+    ordering by id matches ordering by coordinate tuple. Tables:
+      neighbors - flat array of 6 ids per cell in HEX_DIRECTIONS order, -1 off-map
+      terrain   - terrain code per cell (PLAIN / FOREST_CODE / ROCK_CODE)
+      distance  - all-pairs hex distance, one row per source cell built on first use
+    It also acts as the sequence of coords, with O(1) membership, so it can be
+    passed anywhere a map_coords list is expected.
+    """
+    def __init__(self, radius):
+        self.radius = radius
+        self.coords = generate_hex_map(radius)
+        self.size = len(self.coords)
+        self.index = {c: i for i, c in enumerate(self.coords)}
+        self.neighbors = array('i', [-1]) * (6 * self.size)
+        for i, (q, r) in enumerate(self.coords):
+            for d, (dq, dr) in enumerate(HEX_DIRECTIONS):
+                self.neighbors[6*i + d] = self.index.get((q + dq, r + dr), -1)
+        self.terrain = array('b', [PLAIN]) * self.size
+        self.terrain_version = 0
+        self._dist_type = 'B' if 2 * radius < 256 else 'H'
+        self._dist_rows = [None] * self.size
+        self._los_tables = {}
+
+    # Sequence-of-coords behaviour
+    def __iter__(self):
+        return iter(self.coords)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        return self.coords[i]
+
+    def __contains__(self, coord):
+        return coord in self.index
+
+    def copy(self):
+        return list(self.coords)
+
+    def cell(self, q, r):
+        # id of the cell at (q, r), or -1 if off-map
+        return self.index.get((q, r), -1)
+
+    def neighbor_ids(self, cell):
+        return self.neighbors[6*cell:6*cell + 6]
+
+    def set_terrain(self, terrain_map):
+        """Load a coord -> terrain type dict into the terrain array."""
+        terrain = array('b', [PLAIN]) * self.size
+        for coord, kind in terrain_map.items():
+            i = self.index.get(coord)
+            if i is not None:
+                terrain[i] = TERRAIN_CODES.get(kind, PLAIN)
+        self.terrain = terrain
+        self.terrain_version += 1
+
+    def distance_row(self, cell):
+        """Distances from `cell` to every cell, indexed by id."""
+        row = self._dist_rows[cell]
+        if row is None:
+            q, r = self.coords[cell]
+            s = -q - r
+            row = array(self._dist_type, [max(abs(q - cq), abs(r - cr), abs(s + cq + cr)) for cq, cr in self.coords])
+            self._dist_rows[cell] = row
+        return row
+
+    def distance(self, a, b):
+        return self.distance_row(a)[b]
+
+    def coord_distance(self, a, b):
+        return self.distance_row(self.index[a])[self.index[b]]
+
+    def line_of_sight(self, max_range):
+        """Shared LineOfSightTable for shots up to max_range, current with the terrain."""
+        table = self._los_tables.get(max_range)
+        if table is None:
+            table = self._los_tables[max_range] = LineOfSightTable(self, max_range)
+        elif table.terrain_version != self.terrain_version:
+            table.build()
+        return table
+
+
+class LineOfSightTable:
+    """Precomputed rays for every (from, to) pair of cells within max_range.
+
+    A ray holds the cells between the two ends that Longbow.has_line_of_sight
+    walks (signed unit steps along q and r). Pairs whose ray crosses rock are
+    left out, so a query only has to check the ray for units. The table is
+    rebuilt only when the grid's terrain changes.
+    """
+    def __init__(self, grid, max_range):
+        self.grid = grid
+        self.max_range = max_range
+        # Offsets within range and the ray offsets walked to reach them
+        self.offsets = []
+        for dq in range(-max_range, max_range + 1):
+            for dr in range(-max_range, max_range + 1):
+                steps = max(abs(dq), abs(dr), abs(dq + dr))
+                if 0 < steps <= max_range:
+                    sq = 0 if dq == 0 else dq // abs(dq)
+                    sr = 0 if dr == 0 else dr // abs(dr)
+                    self.offsets.append((dq, dr, [(sq * i, sr * i) for i in range(1, steps)]))
+        self.build()
+
+    def build(self):
+        grid = self.grid
+        index = grid.index
+        terrain = grid.terrain
+        rays = {}
+        for (q, r) in grid.coords:
+            from_rays = {}
+            for dq, dr, steps in self.offsets:
+                to = (q + dq, r + dr)
+                if to not in index:
+                    continue
+                ray = []
+                for sq, sr in steps:
+                    c = (q + sq, r + sr)
+                    i = index.get(c)
+                    if i is None:
+                        continue  # off-map cells never block
+                    if terrain[i] == ROCK_CODE:
+                        break
+                    ray.append(c)
+                else:
+                    from_rays[to] = tuple(ray)
+            rays[(q, r)] = from_rays
+        self.rays = rays
+        self.terrain_version = grid.terrain_version
+
+    def is_clear(self, a, b, occupied=()):
+        """True if b is within range of a and no rock or occupied cell is in between."""
+        ray = self.rays.get(a, {}).get(b)
+        if ray is None:
+            return False
+        for c in ray:
+            if c in occupied:
+                return False
+        return True
+
+    def visible(self, a, occupied=()):
+        """Every cell within range of a with a clear line, in one pass."""
+        return [b for b, ray in self.rays.get(a, {}).items()
+                if not any(c in occupied for c in ray)]
+
+# Fill color for a terrain type
+def terrain_color(terrain):
+    if terrain == TERRAIN_FOREST:
+        return FOREST
+    elif terrain == TERRAIN_ROCK:
+        return ROCK
+    return TAN
+
+HEX_OUTLINE = (100, 80, 60)
+HIGHLIGHT = (240, 240, 180)
+
 # Draw the whole map; accepts a terrain dict mapping coords -> terrain type
-def draw_map(surface, coords, terrain_map=None, highlight_set=None, origin=None):
+def draw_map(surface, coords, terrain_map=None, highlight_set=None, origin=None, camera=None):
+    import pygame
+    size = HEX_SIZE
+    if camera is not None:
+        # only hexes in view are drawn
+        coords = camera.visible(coords)
+        size = camera.hex_size
     for (q, r) in coords:
-        x, y = axial_to_pixel(q, r, origin=origin)
-        pts = hex_corners(x, y)
+        x, y = axial_to_pixel(q, r, origin=origin, camera=camera)
+        pts = hex_corners(x, y, size)
         terrain = terrain_map.get((q, r), None) if terrain_map else None
-        if terrain == TERRAIN_FOREST:
-            color = FOREST
-        elif terrain == TERRAIN_ROCK:
-            color = ROCK
-        else:
-            color = TAN
-        pygame.draw.polygon(surface, color, pts)
-        pygame.draw.polygon(surface, (100, 80, 60), pts, 2)
+        pygame.draw.polygon(surface, terrain_color(terrain), pts)
+        pygame.draw.polygon(surface, HEX_OUTLINE, pts, 2)
         if highlight_set and (q, r) in highlight_set:
-            pygame.draw.polygon(surface, (240, 240, 180), pts, 0)
+            pygame.draw.polygon(surface, HIGHLIGHT, pts, 0)
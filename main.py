@@ -1,15 +1,30 @@
 # Main game file which runs the game
 
 # Import packages and supporting files
+import argparse
 import pygame
 import sys
-import random
+import threading
 from settings import *
-from hexgrid import generate_hex_map, draw_map, axial_to_pixel, hex_corners
+from hexgrid import Camera, pixel_to_axial
 from entities import Unit, Longbow
-from ai import SimpleAI, screen_stub, stub_font
-from stats import GameStats
+from engine import GameEngine, STATE_MENU, STATE_PLAYING, STATE_GAMEOVER
+from ai import AI_TYPES
 import ui
+from renderer import MapRenderer
+from animation import AnimationQueue, FloatingText
+from rl_ai import AITurn
+from planner import AIPlanner
+from eventlog import EventLog
+from profiler import FrameProfiler
+from combat import combat_odds
+
+# Optional map size; the camera makes maps larger than the screen playable
+parser = argparse.ArgumentParser(description='Play TinyHex.')
+parser.add_argument('--radius', type=int, default=MAP_RADIUS)
+parser.add_argument('--units', type=int, default=MAX_UNITS)
+parser.add_argument('--ai', default='simple', choices=AI_TYPES, help='opponent: greedy weights or tree search')
+args = parser.parse_args()
 
 # Initialize Pygame
 pygame.init()
@@ -21,78 +36,41 @@ font_tooltip = pygame.font.SysFont('Arial', 12)
 font_title = pygame.font.SysFont('Times New Roman', 48, bold=True)
 font_sub = pygame.font.SysFont('Arial', 20)
 
-# Create basic terrain map: random small patches of forest and a few rocks (obstacles)
-map_coords = generate_hex_map(MAP_RADIUS)
-
-def generate_terrain(coords):
-    tmap = {}
-    # place a few rocks and forests deterministically for reproducibility
-    candidates = coords.copy()
-    random.shuffle(candidates)
-    for i, c in enumerate(candidates[:4]):
-        tmap[c] = TERRAIN_ROCK
-    for j, c in enumerate(candidates[4:10]):
-        if c not in tmap:
-            tmap[c] = TERRAIN_FOREST
-    return tmap
-
-terrain_map = generate_terrain(map_coords)
+# Game state lives in the headless engine; this file only handles input and rendering
+# Every game of the session is appended to the event log
+event_log = EventLog('tinyhex_events.jsonl')
+game = GameEngine(args.radius, args.units, event_log=event_log, ai_types={1: args.ai})
+map_coords = game.map_coords
+terrain_map = game.terrain_map
+units = game.units
+stats = game.stats
+ai = game.ai
+odds = combat_odds()  # attack odds for the tooltip; the AIs share the same tables
 
-# Unit spawning
-def spawn_units(record_unit_lost=None):
-    units = []
-    spawnable = list(map_coords)
-    random.shuffle(spawnable)
-    # place simple units first
-    for coord in spawnable:
-        if len(units) >= MAX_UNITS:
-            break
-        q, r = coord
-        # bias spawn by r coordinate
-        if len([u for u in units if u.owner == 0]) < MAX_UNITS//2 and r < 1:
-            u = Unit('P', q, r, owner=0, record_unit_lost=record_unit_lost)
-            units.append(u)
-            stats.register_unit(u)
-        elif len([u for u in units if u.owner == 1]) < MAX_UNITS - MAX_UNITS//2 and r > -1:
-            u = Unit('E', q, r, owner=1, record_unit_lost=record_unit_lost)
-            units.append(u)
-            stats.register_unit(u)
-    # replace one unit on each side with a Longbow if available
-    for side in [0, 1]:
-        team = [u for u in units if u.owner == side]
-        if team:
-            victim = team[0]
-            units.remove(victim)
-            l = Longbow('L', victim.q, victim.r, owner=side, record_unit_lost=record_unit_lost)
-            units.append(l)
-            stats.register_unit(l)
-    return units
+# Animations are posted to a frame-driven queue; hook the stub to it.
+# Only the main thread animates: the AI planner's copy of the game must not.
+anims = AnimationQueue()
+import entities as entities_module
+main_thread = threading.main_thread()
+entities_module.animation_queue = lambda: anims if threading.current_thread() is main_thread else None
 
+# View onto the map: mouse wheel zooms, right-drag or arrow keys pan, Home recenters
+camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
+CAMERA_PAN_SPEED = 600  # pixels per second for the arrow keys
+ZOOM_STEP = 1.15
+dragging = False
 
-stats = GameStats()
-units = spawn_units(record_unit_lost=stats.record_unit_lost)
-
-# Hook the AI stubs to real references
-# Pass stats.record_attack to AI so it can track AI attacks
-ai = SimpleAI(units, map_coords, terrain_map, record_attack=stats.record_attack)
-# monkey patch animation references expected by ai and rl_ai modules
-import ai as ai_module
-import rl_ai as rl_ai_module
-ai_module.screen_stub = lambda: screen
-ai_module.stub_font = lambda: font
-rl_ai_module.screen_stub = lambda: screen
-rl_ai_module.stub_font = lambda: font
-
-# Game state
-STATE_MENU = 'menu'
-STATE_PLAYING = 'playing'
-STATE_GAMEOVER = 'game_over'
+# Menu / playing / game over (the engine only tracks playing vs. game over)
 state = STATE_MENU
 
-current_turn = 0  # 0=player, 1=ai
 selected_unit = None
 valid_moves = []
 message = ''
+# The AI plans its phase on a worker thread, starting during the player's phase
+# and replanning when the player's moves change the board; the finished plan
+# is then applied a slice of AI_FRAME_BUDGET_MS per frame
+planner = AIPlanner(game)
+ai_turn = None
 
 # UI rects
 end_turn_rect = pygame.Rect(SCREEN_WIDTH - 170, 12, 150, 36)
@@ -104,67 +82,105 @@ export_rect = pygame.Rect(SCREEN_WIDTH//2 - 90, SCREEN_HEIGHT//2 + 150, 180, 42)
 
 # Helpers
 def unit_at(q, r):
-    for u in units:
-        if u.alive and u.q == q and u.r == r:
-            return u
-    return None
-
-def pixel_to_axial(mx, my):
-    best = None
-    bestd = 1e9
-    for (q, r) in map_coords:
-        x, y = axial_to_pixel(q, r)
-        d = (x-mx)**2 + (y-my)**2
-        if d < bestd:
-            bestd = d
-            best = (q, r)
-    return best
+    return game.unit_at(q, r)
 
-# Track which units have acted this phase
-def reset_action_flags(owner):
-    for u in units:
-        if u.owner == owner and u.alive:
-            u.has_moved = False
-            u.has_attacked = False
+# Map hex under a pixel, or None off the map (constant time)
+def pick_hex(mx, my):
+    coord = pixel_to_axial(mx, my, camera=camera)
+    return coord if coord in map_coords else None
 
 # End the current phase and switch sides
 def end_turn():
-    global current_turn, message, selected_unit, valid_moves
+    global message, selected_unit, valid_moves
     selected_unit = None
     valid_moves = []
-    current_turn = 1 - current_turn
-    reset_action_flags(current_turn)
-    message = f"{'Player' if current_turn==0 else 'AI'} phase."
+    game.end_turn()
+    message = f"{'Player' if game.current_turn==0 else 'AI'} phase."
 
 # Reset the whole game without closing window
 def reset_game():
-    global units, ai, terrain_map, current_turn, state, message, stats
-    terrain_map = generate_terrain(map_coords)
-    stats = GameStats()
-    units = spawn_units(record_unit_lost=stats.record_unit_lost)
-    ai = SimpleAI(units, map_coords, terrain_map, record_attack=stats.record_attack)
-    ai_module.screen_stub = lambda: screen
-    ai_module.stub_font = lambda: font
-    rl_ai_module.screen_stub = lambda: screen
-    rl_ai_module.stub_font = lambda: font
-    current_turn = 0
-    reset_action_flags(0)
-    reset_action_flags(1)
+    global units, ai, terrain_map, state, message, stats, ai_turn
+    ai_turn = None
+    planner.reset()
+    game.reset()
+    anims.clear()
+    terrain_map = game.terrain_map
+    stats = game.stats
+    units = game.units
+    ai = game.ai
     state = STATE_MENU
     message = 'Welcome back.'
 
 # Rules pop-up state
 show_rules = False
+RULES_LINES = [
+    "TinyHex Rulebook",
+    "",
+    "1. Each side commands Ground Forces (circles) and Archer Forces (triangles).",
+    "2. All Forces can move within their highlighted hexes and attack adjacent enemies.",
+    "3. Archer Forces can also shoot up to 3 hexes, in a straight line, if nothing blocks line of sight.",
+    "4. Each unit may move and attack once per turn.",
+    "5. After all your units act, click 'End Turn' to let the enemy move and fight.",
+    "6. Attacks are probabilistic; stronger units are more likely to hit.",
+    "7. Forests provide cover. Units in forests are harder to hit.",
+    "8. Rocks block movement and line of sight.",
+    "9. Click the same unit again to deselect it before acting.",
+    "10. When all of one side’s units are destroyed, the game ends.",
+    "Click anywhere again to close this window."
+]
+
+def build_stats_panel(summary, size):
+    panel = pygame.Surface(size)
+    panel.fill((245, 245, 220))
+    pygame.draw.rect(panel, BLACK, panel.get_rect(), 3)
+    y = 30
+    title = ui.render_text(font_title, 'Game Statistics', BLACK)
+    panel.blit(title, ((size[0]-title.get_width())//2, y))
+    y += 60
+    for k, v in summary.items():
+        txt = ui.render_text(font, f"{k}: {v}", BLACK)
+        panel.blit(txt, (40, y))
+        y += 28
+    return panel
+
+# Frame profiler: F3 toggles it and its overlay, F4 writes tinyhex_profile.csv.
+# Off by default; the per-phase marks cost a method call each while it is off.
+profiler = FrameProfiler(1000.0 / FPS)
+font_hud = pygame.font.SysFont('Courier New', 12)
+
+# Layered map renderer; terrain is baked once per terrain map
+renderer = MapRenderer((SCREEN_WIDTH, SCREEN_HEIGHT), camera)
+renderer.profiler = profiler
+# The title screen always shows the map centered at the default zoom
+menu_camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
 
 show_stats_overlay = False
 
 # Main loop
 running = True
-floating_texts = []
 while running:
+    profiler.begin_frame()
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        elif event.type == pygame.MOUSEWHEEL and state != STATE_MENU:
+            mx, my = pygame.mouse.get_pos()
+            camera.zoom_at(ZOOM_STEP ** event.y, mx, my)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+            dragging = True
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+            dragging = False
+        elif event.type == pygame.MOUSEMOTION and dragging and state != STATE_MENU:
+            dx, dy = event.rel
+            camera.pan(-dx, -dy)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_HOME:
+            camera.x = camera.y = 0
+            camera.zoom = 1.0
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            profiler.toggle()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+            profiler.dump_csv('tinyhex_profile.csv')
+            message = 'Profile written to tinyhex_profile.csv.'
         elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             mx, my = event.pos
             if state == STATE_MENU:
@@ -180,8 +196,8 @@ while running:
                         state = STATE_PLAYING
                         message = 'Battle begins.'
                         # ensure fresh action flags
-                        reset_action_flags(0)
-                        reset_action_flags(1)
+                        game.reset_action_flags(0)
+                        game.reset_action_flags(1)
                     elif rules_rect.collidepoint(mx, my):
                         show_rules = True
                     elif quit_rect.collidepoint(mx, my):
@@ -189,14 +205,15 @@ while running:
             elif state == STATE_PLAYING:
                 # UI buttons
                 if end_turn_rect.collidepoint(mx, my):
-                    end_turn()
+                    if game.current_turn == 0:
+                        end_turn()
                     continue
                 if reset_rect.collidepoint(mx, my):
                     reset_game()
                     continue
                 # Player actions only
-                if current_turn == 0:
-                    coord = pixel_to_axial(mx, my)
+                if game.current_turn == 0:
+                    coord = pick_hex(mx, my)
                     if not coord:
                         continue
                     q, r = coord
@@ -221,31 +238,25 @@ while running:
                         if clicked and clicked.owner == 1 and not selected_unit.has_attacked:
                             # melee or ranged
                             if isinstance(selected_unit, Longbow):
-                                if selected_unit.can_attack(clicked, units, terrain_map):
-                                    selected_unit.animate_attack(screen, clicked, font)
-                                    hit, dmg = selected_unit.try_attack(clicked, terrain_map=terrain_map, stats=stats, turn=stats.turns)
-                                    stats.record_attack(0, hit, dmg)
-                                    selected_unit.has_attacked = True
+                                if game.can_attack(selected_unit, clicked):
+                                    selected_unit.animate_attack(anims, clicked)
+                                    hit, dmg = game.attack(selected_unit, clicked)
                                     message = f'Longbow attack -> hit={hit} dmg={dmg}'
                                     # Floating text
-                                    tx, ty = axial_to_pixel(clicked.q, clicked.r)
                                     text = f"{'Miss' if not hit else f'Hit: {dmg}'}"
-                                    floating_texts.append({'text': text, 'x': tx, 'y': ty, 'timer': 40})
+                                    anims.post(FloatingText(text, (clicked.q, clicked.r), font), block=False)
                                     selected_unit = None
                                     valid_moves = []
                                 else:
                                     message = 'Target out of range or no line of sight.'
                             else:
-                                if selected_unit.distance_to(clicked) <= 1:
-                                    selected_unit.animate_attack(screen, clicked, font)
-                                    hit, dmg = selected_unit.try_attack(clicked, terrain_map=terrain_map, stats=stats, turn=stats.turns)
-                                    stats.record_attack(0, hit, dmg)
-                                    selected_unit.has_attacked = True
+                                if game.can_attack(selected_unit, clicked):
+                                    selected_unit.animate_attack(anims, clicked)
+                                    hit, dmg = game.attack(selected_unit, clicked)
                                     message = f'Attack -> hit={hit} dmg={dmg}'
                                     # Floating text
-                                    tx, ty = axial_to_pixel(clicked.q, clicked.r)
                                     text = f"{'Miss' if not hit else f'Hit: {dmg}'}"
-                                    floating_texts.append({'text': text, 'x': tx, 'y': ty, 'timer': 40})
+                                    anims.post(FloatingText(text, (clicked.q, clicked.r), font), block=False)
                                     selected_unit = None
                                     valid_moves = []
                                 else:
@@ -253,13 +264,10 @@ while running:
                         # MOVE CHECK SECOND
                         elif (q, r) in valid_moves and not selected_unit.has_moved:
                             # don't move into rock or occupied
-                            if terrain_map.get((q, r)) == TERRAIN_ROCK:
-                                message = 'Rock blocks movement.'
-                            elif unit_at(q, r):
-                                message = 'Tile occupied.'
+                            error = game.move_unit(selected_unit, q, r)
+                            if error:
+                                message = error
                             else:
-                                selected_unit.q, selected_unit.r = q, r
-                                selected_unit.has_moved = True
                                 message = f'Moved to {q},{r}'
                                 selected_unit = None
                                 valid_moves = []
@@ -303,90 +311,128 @@ while running:
                                 show_stats_overlay = True
 
 
-    # AI phase automatic when it's AI's turn and state is playing
-    if state == STATE_PLAYING and current_turn == 1:
-        ai.take_actions()
-        # After AI attacks, show floating text for each attack
-        for u in units:
-            if hasattr(u, 'last_attack_result') and u.last_attack_result:
+    # Arrow keys pan the view while held
+    keys = pygame.key.get_pressed()
+    step = CAMERA_PAN_SPEED * clock.get_time() / 1000.0
+    pan_x = (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * step
+    pan_y = (keys[pygame.K_DOWN] - keys[pygame.K_UP]) * step
+    if (pan_x or pan_y) and state != STATE_MENU:
+        camera.pan(pan_x, pan_y)
+    profiler.mark('events')
+
+    # AI phase automatic when it's AI's turn and state is playing. The UI keeps
+    # running while the plan is worked out; then units act until this frame's
+    # AI budget is spent and the rest carry on next frame, so big armies keep
+    # the frame rate and each action shows as it happens.
+    if state == STATE_PLAYING and ai_turn is None:
+        planner.update()
+        if game.current_turn == 1:
+            plan = planner.take()
+            if plan is not None:
+                ai_turn = AITurn(game.ais[1], planner.apply(plan))
+    if ai_turn is not None:
+        for u in ai_turn.step(AI_FRAME_BUDGET_MS):
+            # floating text for each attack
+            if getattr(u, 'last_attack_result', None):
                 hit, dmg, target = u.last_attack_result
-                tx, ty = axial_to_pixel(target.q, target.r)
                 text = f"{'Miss' if not hit else f'Hit: {dmg}'}"
-                floating_texts.append({'text': text, 'x': tx, 'y': ty, 'timer': 40})
+                anims.post(FloatingText(text, (target.q, target.r), font), block=False)
                 u.last_attack_result = None
-        end_turn()
-        stats.turns += 1
-
-    # Remove dead units
-    # Remove dead units (no need to record here, handled in try_attack)
-    units = [u for u in units if u.alive]
+        # fallen units leave the map as they fall (dead units never block the AI)
+        game.remove_dead()
+        if ai_turn.done:
+            ai_turn = None
+            end_turn()
+    profiler.mark('ai')
 
-    # Victory check
-    player_alive = any(u.owner == 0 and u.alive for u in units)
-    ai_alive = any(u.owner == 1 and u.alive for u in units)
-    if state == STATE_PLAYING and (not player_alive or not ai_alive):
+    # Remove dead units (no need to record here, handled in try_attack) and check for victory
+    # once the AI phase has finished
+    winner = game.check_victory() if state == STATE_PLAYING and ai_turn is None else None
+    if winner:
         state = STATE_GAMEOVER
-        winner = 'Player' if player_alive else 'AI'
         message = f'Game Over — {winner} wins.'
-        stats.set_winner(winner)
         # Learn from this game: update AI weights based on outcome
         ai_won = (winner == 'AI')
         ai.update_weights_from_game(ai_won)
+        event_log.flush()
+        # Keep the finished game for `python replay.py tinyhex_replay.json --view`
+        game.replay.save('tinyhex_replay.json')
+    profiler.mark('rules')
 
     # --- Render ---
-    screen.fill(TAN)
+    renderer.set_camera(camera if state != STATE_MENU else menu_camera)
     if state == STATE_MENU:
         # themed title screen with the map lightly visible in the background
-        bg_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        draw_map(bg_surface, map_coords, terrain_map)
-        bg_surface.set_alpha(140)
-        screen.blit(bg_surface, (0, 0))
-        ui.draw_title(screen, 'TinyHex', 'a tiny tactical hex wargame', font_title, font_sub, y_offset=60)
-        ui.draw_button(screen, start_rect, 'Start Game', font_sub, bg=GREEN, fg=BLACK)
-        ui.draw_button(screen, rules_rect, 'Rules', font_sub, bg=GRAY, fg=BLACK)
-        ui.draw_button(screen, quit_rect, 'Quit', font_sub, bg=RED, fg=WHITE)
-        footer = font_sub.render('by Brandon Wallace; prototype v.2.3', True, BLACK)
-        screen.blit(footer, (12, SCREEN_HEIGHT - 36))
-        if show_rules:
-            overlay_rect = pygame.Rect(100, 100, 600, 400)
-            pygame.draw.rect(screen, (245, 245, 220), overlay_rect)  # light tan
-            pygame.draw.rect(screen, BLACK, overlay_rect, 3)
-            rules_lines = [
-                "TinyHex Rulebook",
-                "",
-                "1. Each side commands Ground Forces (circles) and Archer Forces (triangles).",
-                "2. All Forces can move within their highlighted hexes and attack adjacent enemies.",
-                "3. Archer Forces can also shoot up to 3 hexes, in a straight line, if nothing blocks line of sight.",
-                "4. Each unit may move and attack once per turn.",
-                "5. After all your units act, click 'End Turn' to let the enemy move and fight.",
-                "6. Attacks are probabilistic; stronger units are more likely to hit.",
-                "7. Forests provide cover. Units in forests are harder to hit.",
-                "8. Rocks block movement and line of sight.",
-                "9. Click the same unit again to deselect it before acting.",
-                "10. When all of one side’s units are destroyed, the game ends.",
-                "Click anywhere again to close this window."
-            ]
-            y = 120
-            for line in rules_lines:
-                txt = font.render(line, True, BLACK)
-                screen.blit(txt, (overlay_rect.x + 20, y))
-                y += 28
+        renderer.set_terrain(map_coords, terrain_map, game.grid.terrain_version)
+        layer = renderer.begin_ui((state, show_rules))
+        if layer:
+            ui.draw_title(layer, 'TinyHex', 'a tiny tactical hex wargame', font_title, font_sub, y_offset=60)
+            ui.draw_button(layer, start_rect, 'Start Game', font_sub, bg=GREEN, fg=BLACK)
+            ui.draw_button(layer, rules_rect, 'Rules', font_sub, bg=GRAY, fg=BLACK)
+            ui.draw_button(layer, quit_rect, 'Quit', font_sub, bg=RED, fg=WHITE)
+            footer = ui.render_text(font_sub, 'by Brandon Wallace; prototype v.2.3', BLACK)
+            layer.blit(footer, (12, SCREEN_HEIGHT - 36))
+            if show_rules:
+                overlay_rect = pygame.Rect(100, 100, 600, 400)
+                pygame.draw.rect(layer, (245, 245, 220), overlay_rect)  # light tan
+                pygame.draw.rect(layer, BLACK, overlay_rect, 3)
+                y = 120
+                for line in RULES_LINES:
+                    txt = ui.render_text(font, line, BLACK)
+                    layer.blit(txt, (overlay_rect.x + 20, y))
+                    y += 28
+        profiler.mark('ui')
+        renderer.draw_menu(screen)
 
     elif state == STATE_PLAYING or state == STATE_GAMEOVER:
-        # map and terrain
-        draw_map(screen, map_coords, terrain_map)
-        # highlights for valid moves
-        if valid_moves:
-            draw_map(screen, valid_moves, {}, highlight_set=set(valid_moves))
-        # draw units
+        # map, highlights for valid moves and units come from cached layers
+        renderer.set_terrain(map_coords, terrain_map, game.grid.terrain_version)
+        renderer.set_highlight(valid_moves)
+        renderer.set_units(units, font)
+        layer = renderer.begin_ui((state, game.current_turn, message))
+        if layer:
+            # UI buttons
+            if state == STATE_PLAYING:
+                ui.draw_button(layer, end_turn_rect, 'End Turn', font, bg=GRAY)
+                ui.draw_button(layer, reset_rect, 'Reset', font, bg=GRAY)
+            # turn & message
+            turn_text = ui.render_text(font, f'Turn: {"Player" if game.current_turn==0 else "AI"}', BLACK)
+            layer.blit(turn_text, (8, 8))
+            msg_text = ui.render_text(font, message, BLACK)
+            layer.blit(msg_text, (8, 28))
+            # game over overlay
+            if state == STATE_GAMEOVER:
+                over = ui.render_text(font_title, 'GAME OVER', BLACK)
+                layer.blit(over, (SCREEN_WIDTH//2 - over.get_width()//2, SCREEN_HEIGHT//2 - 40))
+                # Layout buttons vertically with spacing and consistent size
+                button_labels = [
+                    ('Play Again', GREEN, BLACK),
+                    ('Quit', RED, (255,255,255)),
+                    ('Export Stats (CSV)', GRAY, BLACK),
+                    ('Show Stats', GRAY, BLACK)
+                ]
+                button_height = 42
+                button_width = 180
+                spacing = 18
+                start_y = SCREEN_HEIGHT//2 + 20
+                for i, (label, bg, fg) in enumerate(button_labels):
+                    y = start_y + i*(button_height+spacing)
+                    x = SCREEN_WIDTH//2 - button_width//2
+                    rect = pygame.Rect(x, y, button_width, button_height)
+                    ui.draw_button(layer, rect, label, font, bg=bg, fg=fg)
+        profiler.mark('ui')
+        renderer.draw(screen)
+        # find the unit under the mouse
         mouse_unit = None
         mx, my = pygame.mouse.get_pos()
-        for u in units:
-            u.draw(screen, font)
-            # Check if mouse is over this unit
-            ux, uy = u.pixel_pos()
-            if (mx - ux) ** 2 + (my - uy) ** 2 < 16 ** 2:
-                mouse_unit = u
+        # Only the unit in the hex under the mouse can be hovered
+        hover_hex = pick_hex(mx, my)
+        if hover_hex:
+            u = unit_at(*hover_hex)
+            if u:
+                ux, uy = u.pixel_pos(camera)
+                if (mx - ux) ** 2 + (my - uy) ** 2 < (16 * camera.zoom) ** 2:
+                    mouse_unit = u
 
         # Draw tooltip if hovering over a unit
         if mouse_unit:
@@ -413,63 +459,30 @@ while running:
                 tooltip_lines.append("Type: Ground")
             # Side
             tooltip_lines.append("Player" if mouse_unit.owner == 0 else "Enemy")
-            # Tooltip box (smaller font and box)
-            tip_w = max(font_tooltip.size(line)[0] for line in tooltip_lines) + 10
-            tip_h = len(tooltip_lines) * 16 + 6
-            tip_x = min(mx + 16, SCREEN_WIDTH - tip_w - 4)
-            tip_y = min(my + 16, SCREEN_HEIGHT - tip_h - 4)
-            pygame.draw.rect(screen, (255,255,220), (tip_x, tip_y, tip_w, tip_h))
-            pygame.draw.rect(screen, BLACK, (tip_x, tip_y, tip_w, tip_h), 1)
-            for i, line in enumerate(tooltip_lines):
-                txt = font_tooltip.render(line, True, BLACK)
-                screen.blit(txt, (tip_x + 5, tip_y + 3 + i*16))
-        # UI buttons
-        if state == STATE_PLAYING:
-            ui.draw_button(screen, end_turn_rect, 'End Turn', font, bg=GRAY)
-            ui.draw_button(screen, reset_rect, 'Reset', font, bg=GRAY)
-        # turn & message
-        turn_text = font.render(f'Turn: {"Player" if current_turn==0 else "AI"}', True, BLACK)
-        screen.blit(turn_text, (8, 8))
-        msg_text = font.render(message, True, BLACK)
-        screen.blit(msg_text, (8, 28))
-        # game over overlay
+            # Odds of the selected unit attacking this one
+            if state == STATE_PLAYING and selected_unit and selected_unit.alive and mouse_unit.owner == 1:
+                forest = terrain_map.get((mouse_unit.q, mouse_unit.r)) == TERRAIN_FOREST
+                hit, _, kill = odds.unit_odds(selected_unit, mouse_unit, forest)
+                lo, hi = odds.damage_range(selected_unit.attack)
+                tooltip_lines.append(f"Your attack: {hit:.0%} to hit, {lo}-{hi} damage")
+                within = odds.kill_within(3, selected_unit.hp, mouse_unit.hp, selected_unit.attack, forest)
+                tooltip_lines.append(f"Kill: {kill:.0%} now, {within:.0%} within 3 attacks")
+            # Tooltip box (smaller font and box), rebuilt only when its lines change
+            key = ('tooltip',) + tuple(tooltip_lines)
+            tip = ui.panel_cache.get(key, lambda: ui.build_tooltip(tooltip_lines, font_tooltip))
+            tip_x = min(mx + 16, SCREEN_WIDTH - tip.get_width() - 4)
+            tip_y = min(my + 16, SCREEN_HEIGHT - tip.get_height() - 4)
+            screen.blit(tip, (tip_x, tip_y))
         if state == STATE_GAMEOVER:
-            over = font_title.render('GAME OVER', True, BLACK)
-            screen.blit(over, (SCREEN_WIDTH//2 - over.get_width()//2, SCREEN_HEIGHT//2 - 40))
-            # Layout buttons vertically with spacing and consistent size
-            button_labels = [
-                ('Play Again', GREEN, BLACK),
-                ('Quit', RED, (255,255,255)),
-                ('Export Stats (CSV)', GRAY, BLACK),
-                ('Show Stats', GRAY, BLACK)
-            ]
-            button_height = 42
-            button_width = 180
-            spacing = 18
-            total_height = len(button_labels) * button_height + (len(button_labels)-1)*spacing
-            start_y = SCREEN_HEIGHT//2 + 20
-            button_rects = []
-            for i, (label, bg, fg) in enumerate(button_labels):
-                y = start_y + i*(button_height+spacing)
-                x = SCREEN_WIDTH//2 - button_width//2
-                rect = pygame.Rect(x, y, button_width, button_height)
-                button_rects.append(rect)
-                ui.draw_button(screen, rect, label, font, bg=bg, fg=fg)
             # Show stats overlay if needed
             if show_stats_overlay:
                 overlay_height = 440  # Increased height for more lines
                 overlay_rect = pygame.Rect(SCREEN_WIDTH//2 - 220, SCREEN_HEIGHT//2 - overlay_height//2, 440, overlay_height)
-                pygame.draw.rect(screen, (245, 245, 220), overlay_rect)
-                pygame.draw.rect(screen, BLACK, overlay_rect, 3)
                 summary = stats.summary()
-                y = overlay_rect.y + 30
-                title = font_title.render('Game Statistics', True, BLACK)
-                screen.blit(title, (overlay_rect.x + (overlay_rect.width-title.get_width())//2, y))
-                y += 60
-                for k, v in summary.items():
-                    txt = font.render(f"{k}: {v}", True, BLACK)
-                    screen.blit(txt, (overlay_rect.x + 40, y))
-                    y += 28
+                # Panel is rebuilt only when the summary changes
+                panel = ui.panel_cache.get(('stats',) + tuple(summary.items()),
+                                           lambda: build_stats_panel(summary, overlay_rect.size))
+                screen.blit(panel, overlay_rect.topleft)
                 # No close button; click anywhere on overlay to close
             if show_stats_overlay:
                 overlay_height = 440  # Must match above
@@ -477,17 +490,22 @@ while running:
                 if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                     if overlay_rect.collidepoint(mx, my):
                         show_stats_overlay = False
+        profiler.mark('overlays')
 
-    # Animate floating texts
-    for ft in floating_texts[:]:
-        txt = font.render(ft['text'], True, (0,0,0))
-        screen.blit(txt, (ft['x'] - txt.get_width()//2, ft['y'] - ft['timer']))
-        ft['timer'] -= 1
-        if ft['timer'] <= 0:
-            floating_texts.remove(ft)
+    # Advance attack/death animations and floating texts by the last frame's time
+    anims.update(clock.get_time() / 1000.0)
+    anims.draw(screen, camera)
+    profiler.mark('anims')
+    if profiler.enabled:
+        profiler.draw(screen, font_hud, (8, SCREEN_HEIGHT - 200))
+        profiler.mark('hud')
 
     pygame.display.flip()
+    profiler.mark('flip')
+    profiler.end_frame()
     clock.tick(FPS)
 
+planner.close()
+event_log.close()
 pygame.quit()
 sys.exit()
@@ -0,0 +1,374 @@
+# mcts_ai.py
+# Monte Carlo Tree Search opponent: units in contact with the enemy pick their
+# action by searching the side's coming decisions on a GameState, with attack
+# rolls as chance nodes; the RLAI weights give the priors and the rollout policy.
+import math
+import random
+import time
+from gamestate import GameState
+from hexgrid import FOREST_CODE
+from rl_ai import RLAI
+from zobrist import TranspositionTable
+
+# Action kinds: (ATTACK, target's cell id), (MOVE, cell id), (HOLD,)
+ATTACK, MOVE, HOLD = range(3)
+
+
+class _Node:
+    """Decision node: one unit's candidate actions with their priors and the
+    visit/value totals of each. The child of an attack is a chance node, a dict
+    damage -> _Node (0 is a miss); other children are _Nodes. `key` is the
+    GameState.decision_key of the node's position."""
+
+    __slots__ = ('key', 'actions', 'priors', 'visits', 'child_visits', 'child_values', 'children')
+
+    def __init__(self, key, actions, priors):
+        self.key = key
+        self.actions = actions
+        self.priors = priors
+        self.visits = 0
+        self.child_visits = [0] * len(actions)
+        self.child_values = [0.0] * len(actions)
+        self.children = [None] * len(actions)
+
+
+class MCTSAI(RLAI):
+    """RLAI with a tree search for the units that can fight this phase.
+
+    For each such unit the tree covers its action and those of the next
+    `max_depth - 1` engaged units in order, each choosing to attack a target in
+    reach, move to one of the `max_moves` best cells or hold. An attack's roll
+    is a chance node sampled with Unit.try_attack's hit formula and Gaussian
+    damage. A leaf is scored after a rollout (the remaining tree units attack,
+    then nearby enemies strike back, all with the greedy weighted policy) by
+    the hp and units left on both sides nearby. Selection is PUCT with priors
+    from the same weighted scores RLAI uses.
+
+    The budget is `iterations` per decision, or `time_budget` seconds per phase
+    when given (then results depend on the machine). Searches draw from their
+    own RNG seeded from the game RNG's state, so the game's dice, and with an
+    iteration budget the whole game, stay reproducible. Units out of contact
+    act exactly like RLAI.
+
+    Every searched node is stored in a transposition table (2**table_bits
+    entries) by position key, with its visits, value and most visited action.
+    Later decisions reached through the search, or the same position by
+    another move order, start from that: the stored action is returned
+    outright if it had at least a full search behind it, and otherwise gets
+    half the prior.
+    """
+
+    def __init__(self, units, map_coords, terrain_map=None, record_attack=None, weights_file='rl_weights.json',
+                 owner=1, registry=None, record_move=None, rng=random, iterations=200, time_budget=None,
+                 exploration=1.0, max_moves=5, max_depth=4, table_bits=16):
+        super().__init__(units, map_coords, terrain_map, record_attack, weights_file, owner, registry,
+                         record_move, rng)
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.max_moves = max_moves
+        self.max_depth = max_depth
+        self.search_rng = random.Random(0)
+        self.table = TranspositionTable(table_bits)
+        # Search counters, accumulated over the AI's lifetime
+        self.decisions = 0
+        self.cached = 0  # decisions answered from the table without a search
+        self.iterations_run = 0
+        self.nodes = 0
+        self.search_time = 0.0
+
+    @property
+    def nodes_per_sec(self):
+        return self.nodes / self.search_time if self.search_time else 0.0
+
+    def report(self):
+        """Search totals: decisions, iterations, nodes, seconds, nodes per second
+        and the transposition table's counters."""
+        return {'decisions': self.decisions, 'cached': self.cached, 'iterations': self.iterations_run,
+                'nodes': self.nodes, 'seconds': self.search_time, 'nodes_per_sec': self.nodes_per_sec,
+                'table': self.table.report()}
+
+    def iter_actions(self):
+        if self.grid is None:
+            # The search needs the HexGrid tables
+            yield from super().iter_actions()
+            return
+        ai_units = list(self.registry.alive(self.owner))
+        player_units = self.registry.enemies(self.owner)
+        if not player_units:
+            return
+        everyone = [u for u in self.units if u.alive]
+        index = {u: i for i, u in enumerate(everyone)}
+        state = GameState(self.grid, everyone, side=self.owner)
+        engaged = self._engaged(state, [index[u] for u in ai_units], [index[u] for u in player_units])
+        position = {i: n for n, i in enumerate(engaged)}
+        deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+        self.table.new_search()
+        self.focus_counts = self.count_focus()
+        try:
+            for u in ai_units:
+                if not player_units:
+                    break
+                i = index[u]
+                if i in position:
+                    rest = engaged[position[i] + 1:]
+                    per_decision = None
+                    if deadline is not None:
+                        per_decision = time.perf_counter() + max(0.0, deadline - time.perf_counter()) / (len(rest) + 1)
+                    action = self.decide(state, [i] + rest, per_decision)
+                    self._execute(u, action, state, i, everyone)
+                else:
+                    # Greedy RLAI move, mirrored into the search state
+                    before = (u.q, u.r)
+                    u.last_attack_result = None
+                    self.act(u, player_units)
+                    if (u.q, u.r) != before:
+                        state.move(i, self.grid.index[(u.q, u.r)])
+                    if u.last_attack_result:
+                        _, dmg, target = u.last_attack_result
+                        state.attack(i, index[target], dmg)
+                yield u
+        finally:
+            self.focus_counts = None
+
+    def _engaged(self, state, own, enemies):
+        # Own units within striking distance of an enemy (a move plus the longest
+        # range), in roster order
+        grid = state.grid
+        reach = max(state.move_range[i] for i in own) + max(state.range[i] for i in own)
+        danger = set()
+        index = grid.index
+        for j in enemies:
+            q, r = state.coord(j)
+            for dq in range(-reach, reach + 1):
+                for dr in range(max(-reach, -dq - reach), min(reach, -dq + reach) + 1):
+                    c = index.get((q + dq, r + dr))
+                    if c is not None:
+                        danger.add(c)
+        return [i for i in own if state.cell[i] in danger]
+
+    def decide(self, state, order, deadline=None):
+        """Search the decisions of the units in `order` (the first one acts now)
+        and return the most visited root action."""
+        order = order[:self.max_depth]
+        i = order[0]
+        enemies = self._local_enemies(state, order)
+        root = self._expand(state, i, enemies)
+        self.nodes += 1
+        if len(root.actions) == 1:
+            return root.actions[0]
+        entry = self.table.probe(root.key)
+        if entry is not None and entry[2] in root.actions:
+            depth, _, action = entry
+            if deadline is None and depth >= self.iterations:
+                self.cached += 1
+                return action
+            hinted = root.actions.index(action)
+            root.priors = [p / 2 + (0.5 if a == hinted else 0.0) for a, p in enumerate(root.priors)]
+        rng = self.search_rng
+        rng.seed(hash((self.rng.getstate()[1], i)))
+        start = time.perf_counter()
+        iterations = 0
+        while True:
+            self._iterate(root, state, order, enemies, rng)
+            iterations += 1
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    break
+            elif iterations >= self.iterations:
+                break
+        self.decisions += 1
+        self.iterations_run += iterations
+        self.search_time += time.perf_counter() - start
+        self._store(root)
+        return root.actions[self._best(root)]
+
+    @staticmethod
+    def _best(node):
+        return max(range(len(node.actions)), key=lambda a: (node.child_visits[a], node.priors[a]))
+
+    def _store(self, root):
+        # Put every visited node of the tree in the transposition table
+        table = self.table
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if not node.visits:
+                continue
+            best = self._best(node)
+            table.store(node.key, node.visits, node.child_values[best] / max(1, node.child_visits[best]),
+                        node.actions[best])
+            for child in node.children:
+                if isinstance(child, dict):
+                    stack.extend(child.values())
+                elif child is not None:
+                    stack.append(child)
+
+    def _local_enemies(self, state, order):
+        # Living enemies that could take part in the fight around `order`
+        reach = 2 * (max(state.move_range) + max(state.range))
+        owner = state.owner
+        enemies = []
+        for j in state.occ.values():
+            if owner[j] != self.owner and any(state.distance(i, j) <= reach for i in order):
+                enemies.append(j)
+        enemies.sort()
+        return enemies
+
+    def _iterate(self, root, state, order, enemies, rng):
+        mark = len(state.history)
+        node = root
+        path = []
+        d = 0
+        while True:
+            a = self._select(node)
+            path.append((node, a))
+            action = node.actions[a]
+            i = order[d]
+            if action[0] == ATTACK:
+                j = state.occ[action[1]]
+                _, dmg = state.roll_attack(i, j, rng)
+                state.attack(i, j, dmg)
+                chance = node.children[a]
+                if chance is None:
+                    chance = node.children[a] = {}
+                child = chance.get(dmg)
+            else:
+                if action[0] == MOVE:
+                    state.move(i, action[1])
+                chance = None
+                child = node.children[a]
+            d += 1
+            if d >= len(order):
+                break
+            if child is None:
+                child = self._expand(state, order[d], enemies)
+                if chance is not None:
+                    chance[dmg] = child
+                else:
+                    node.children[a] = child
+                self.nodes += 1
+                break
+            node = child
+        value = self._rollout(state, order[d:], order, enemies, rng)
+        for node, a in path:
+            node.visits += 1
+            node.child_visits[a] += 1
+            node.child_values[a] += value
+        while len(state.history) > mark:
+            state.undo()
+
+    def _select(self, node):
+        # PUCT; unvisited actions count as even (0.5)
+        c = self.exploration * math.sqrt(node.visits + 1)
+        best, best_score = 0, -1.0
+        for a, prior in enumerate(node.priors):
+            n = node.child_visits[a]
+            q = node.child_values[a] / n if n else 0.5
+            score = q + c * prior / (1 + n)
+            if score > best_score:
+                best, best_score = a, score
+        return best
+
+    def _target_score(self, state, i, j):
+        # RLAI.evaluate_target's terms, without focus fire
+        w = self.weights
+        odds = self.odds
+        terrain = state.grid.terrain
+        hp, own_hp = state.hp[j], state.hp[i]
+        kill = odds.kill_chance(own_hp, hp, state.attack_value[i], terrain[state.cell[j]] == FOREST_CODE)
+        hp_score = (state.max_hp[j] - hp) / state.max_hp[j] + kill
+        threat = odds.expected_damage(hp, own_hp, state.attack_value[j], terrain[state.cell[i]] == FOREST_CODE)
+        threat = threat / max(1, own_hp) * (1.5 if state.kind[j] else 1.0)
+        distance_score = 1.0 / (state.distance(i, j) + 1)
+        return (w['target_hp_weight'] * hp_score + w['target_distance_weight'] * distance_score +
+                w['target_threat_weight'] * threat)
+
+    def _cell_score(self, state, i, cell, enemies):
+        # RLAI.evaluate_position's terms plus progress toward the nearest enemy
+        w = self.weights
+        grid = state.grid
+        owner = state.owner[i]
+        adjacent_enemies = allies = 0
+        for c in grid.neighbor_ids(cell):
+            k = state.occ.get(c)
+            if k is not None and k != i:
+                if state.owner[k] == owner:
+                    allies += 1
+                else:
+                    adjacent_enemies += 1
+        score = 1.0 - adjacent_enemies * w['safety_weight'] * 0.2
+        if grid.terrain[cell] == FOREST_CODE:
+            score += w['terrain_defense_weight'] * 0.3
+        score += w['formation_weight'] * min(allies, 2) * 0.1
+        alive = [state.cell[j] for j in enemies if state.alive[j]]
+        if alive:
+            row = grid.distance_row(cell)
+            nearest = min(row[c] for c in alive)
+            if state.hp[i] < w['retreat_threshold'] * state.max_hp[i]:
+                score += w['target_distance_weight'] * nearest * 0.2
+            else:
+                score += w['target_distance_weight'] / (nearest + 1)
+        return score
+
+    def _expand(self, state, i, enemies):
+        actions, scores = [], []
+        for j in state.targets(i):
+            actions.append((ATTACK, state.cell[j]))
+            scores.append(1.0 + self._target_score(state, i, j))
+        moves = [(self._cell_score(state, i, c, enemies), c) for c in state.moves(i)]
+        moves.sort(reverse=True)
+        for score, cell in moves[:self.max_moves]:
+            actions.append((MOVE, cell))
+            scores.append(score)
+        actions.append((HOLD,))
+        scores.append(self._cell_score(state, i, state.cell[i], enemies))
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return _Node(state.decision_key(i), actions, [e / total for e in exps])
+
+    def _strike(self, state, i, rng):
+        # Greedy rollout policy: attack the best-scoring target in reach, if any
+        targets = state.targets(i)
+        if targets:
+            j = max(targets, key=lambda t: self._target_score(state, i, t))
+            _, dmg = state.roll_attack(i, j, rng)
+            state.attack(i, j, dmg)
+
+    def _rollout(self, state, rest, own, enemies, rng):
+        for i in rest:
+            self._strike(state, i, rng)
+        for j in enemies:
+            if state.alive[j]:
+                self._strike(state, j, rng)
+        return self._evaluate(state, own, enemies)
+
+    def _evaluate(self, state, own, enemies):
+        # 0..1 for this side: share of hp and of units kept, ours against theirs
+        def kept(units):
+            hp = sum(max(0, state.hp[k]) for k in units)
+            max_hp = sum(state.max_hp[k] for k in units)
+            alive = sum(state.alive[k] for k in units)
+            return hp / max_hp if max_hp else 0.0, alive / len(units) if units else 0.0
+        own_hp, own_alive = kept(own)
+        enemy_hp, enemy_alive = kept(enemies)
+        return 0.5 + 0.25 * ((own_hp - enemy_hp) + (own_alive - enemy_alive))
+
+    def _execute(self, u, action, state, i, everyone):
+        # Carry out a searched action on the live unit and mirror it into the state
+        if action[0] == ATTACK:
+            j = state.occ[action[1]]
+            self._execute_attack(u, everyone[j])
+            _, dmg, _ = u.last_attack_result
+            state.attack(i, j, dmg)
+            u.has_moved = True
+        elif action[0] == MOVE:
+            q, r = self.grid.coords[action[1]]
+            u.move_to(q, r)
+            if self.record_move:
+                self.record_move(u, q, r)
+            u.has_moved = True
+            state.move(i, action[1])
+            if self.grid.terrain[action[1]] == FOREST_CODE:
+                self.game_history.append({'action': 'move', 'used_terrain': True})
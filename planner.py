@@ -0,0 +1,172 @@
+# planner.py
+# Plans AI phases on a worker thread against a private copy of the game; the
+# main thread checks each planned action and applies it to the live game.
+from concurrent.futures import ThreadPoolExecutor
+from engine import GameEngine
+from replay import ACT_MOVE
+
+
+def phase_state(engine, side):
+    """Frozen state the AI phase of `side` starts from, as tuples of ints:
+    (round, side, the unit fields of GameEngine.snapshot() with that side's
+    action flags cleared, each unit's focus-fire target as a roster index or -1).
+    """
+    turns, _, fields = engine.snapshot()
+    for i, u in enumerate(engine.roster):
+        if u.owner == side and u.alive:
+            fields[6*i+4] = fields[6*i+5] = 0
+    index = engine.roster_index
+    targets = tuple(index.get(getattr(u, 'last_attack_target', None), -1) for u in engine.roster)
+    return (turns, side, tuple(fields), targets)
+
+
+class Plan:
+    """One planned AI phase: the actions (replay.py codes, units by roster index),
+    the AI's learning-history entries and the (has_moved, has_attacked) flags
+    its units end with, keyed by roster index."""
+
+    def __init__(self, state, actions, history, flags):
+        self.state = state
+        self.actions = actions
+        self.history = history
+        self.flags = flags
+
+
+class AIPlanner:
+    """Plans the AI phases of `side` for a live GameEngine in the background.
+
+    update() hands the worker a phase_state() whenever the board changes, so
+    planning starts during the other side's phase and is redone when that
+    side's moves change the board. The worker replays the state on its own
+    copy of the game (same seed, hence the same map and the same phase RNG)
+    and runs the AI there, so a plan is exactly what the AI would have done on
+    the live game. Nothing on the worker touches live objects.
+
+    take() returns the finished plan once the AI phase has started and apply()
+    carries it out on the main thread.
+    """
+
+    def __init__(self, engine, side=1):
+        self.engine = engine
+        self.side = side
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ai-planner')
+        self.planned = 0    # plans finished by the worker
+        self.ready = 0      # AI phases whose plan was done when they started
+        self.rejected = 0   # planned actions found illegal on the live board
+        self._generation = 0  # bumped for every request; older jobs stop early
+        self._future = None
+        self._state = None    # state of the latest request
+        self._board = None    # (seed, actions recorded) when the state was last taken
+        self._shadow = None   # the worker's copy of the game
+        self._shadow_setup = None
+        self._waited = False  # take() found no plan yet this phase
+
+    def update(self):
+        """Call every frame while playing; (re)plans if the board has changed."""
+        engine = self.engine
+        board = (engine.seed, len(engine.replay.actions))
+        if board == self._board:
+            return
+        self._board = board
+        state = phase_state(engine, self.side)
+        if state != self._state:
+            self._request(state)
+
+    def _request(self, state):
+        engine = self.engine
+        self._generation += 1
+        self._state = state
+        setup = (engine.seed, engine.radius, engine.max_units, engine.ai_weights[self.side],
+                 engine.ai_types.get(self.side, 'simple'))
+        weights = dict(engine.ais[self.side].weights)
+        self._future = self.executor.submit(self._plan, self._generation, setup, weights, state)
+
+    def take(self):
+        """The plan for the AI phase now under way, or None while it is being worked out."""
+        engine = self.engine
+        if engine.current_turn != self.side:
+            return None
+        self.update()
+        future = self._future
+        if future is None or not future.done():
+            self._waited = True
+            return None
+        plan = future.result()
+        self._future = None
+        self._state = None  # the board the plan was for is about to change
+        if plan is None or plan.state != phase_state(engine, self.side):
+            self._board = None
+            self._waited = True
+            return None
+        if not self._waited:
+            self.ready += 1
+        self._waited = False
+        return plan
+
+    def apply(self, plan):
+        """Carry out `plan` on the live game, yielding each unit after its action
+        (for AITurn). Actions that are not legal on the live board are skipped."""
+        engine = self.engine
+        ai = engine.ais[self.side]
+        roster = engine.roster
+        side = self.side
+        for action in plan.actions:
+            unit = roster[action[1]]
+            if not unit.alive or unit.owner != side:
+                self.rejected += 1
+                continue
+            if action[0] == ACT_MOVE:
+                q, r = action[2], action[3]
+                if unit.has_moved or (q, r) not in unit.possible_moves(engine.grid, engine.terrain_map) \
+                        or engine.move_unit(unit, q, r):
+                    self.rejected += 1
+                    continue
+            else:
+                target = roster[action[2]]
+                if unit.has_attacked or target.owner == side or not engine.can_attack(unit, target):
+                    self.rejected += 1
+                    continue
+                ai.resolve_attack(unit, target)
+            yield unit
+        for i, (moved, attacked) in plan.flags.items():
+            roster[i].has_moved, roster[i].has_attacked = moved, attacked
+        ai.game_history.extend(plan.history)
+
+    def _plan(self, generation, setup, weights, state):
+        # Runs on the worker thread and only touches the shadow game
+        if generation != self._generation:
+            return None
+        if self._shadow_setup != setup:
+            seed, radius, max_units, weights_file, ai_type = setup
+            self._shadow = GameEngine(radius, max_units, ai_weights={self.side: weights_file}, seed=seed,
+                                      ai_types={self.side: ai_type})
+            self._shadow.reset(seed)
+            self._shadow_setup = setup
+        shadow = self._shadow
+        turns, side, fields, targets = state
+        shadow.restore([turns, side, list(fields)])
+        roster = shadow.roster
+        for u, t in zip(roster, targets):
+            u.last_attack_target = roster[t] if t >= 0 else None
+            u.last_attack_result = None
+        ai = shadow.ais[self.side]
+        ai.weights = weights
+        ai.game_history = []
+        del shadow.replay.actions[:]
+        for _ in ai.iter_actions():
+            if generation != self._generation:
+                return None  # the board changed; a newer request is queued
+        flags = {i: (u.has_moved, u.has_attacked) for i, u in enumerate(roster) if u.owner == self.side}
+        self.planned += 1
+        return Plan(state, list(shadow.replay.actions), ai.game_history, flags)
+
+    def reset(self):
+        """Drop any plan in progress (e.g. when a new game starts)."""
+        self._generation += 1
+        self._future = None
+        self._state = self._board = None
+        self._waited = False
+
+    def close(self):
+        self._generation += 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,124 @@
+# profiler.py
+# Frame-budget profiler for the main loop: per-phase timings with rolling
+# p50/p95/p99, a count of frames over budget, an on-screen HUD and a CSV dump.
+import csv
+import time
+from collections import deque
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+class FrameProfiler:
+    """Splits every frame into named phases.
+
+    begin_frame() starts a frame, mark(name) charges the time since the previous
+    mark to `name` (a phase may be marked several times a frame), end_frame()
+    closes it. The last `window` frames are kept. While disabled every call
+    returns at once, so the hooks can stay in the loop permanently.
+    """
+
+    def __init__(self, budget_ms, window=600, enabled=False):
+        self.budget_ms = budget_ms
+        self.window = window
+        self.enabled = enabled
+        self.phases = []  # phase names in first-seen order
+        self.samples = {}  # phase -> deque of ms, one entry per frame
+        self.totals = deque(maxlen=window)  # whole-frame ms
+        self.frames = 0
+        self.missed = 0
+        self._frame = {}
+        self._start = self._last = time.perf_counter()
+        self._hud = None
+        self._hud_time = 0.0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        # a frame in progress is measured from here
+        self._start = self._last = time.perf_counter()
+        self._frame = {}
+        return self.enabled
+
+    def reset(self):
+        self.samples = {phase: deque(maxlen=self.window) for phase in self.phases}
+        self.totals.clear()
+        self.frames = self.missed = 0
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._start = self._last = time.perf_counter()
+        self._frame = {}
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        frame = self._frame
+        frame[phase] = frame.get(phase, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        total = (time.perf_counter() - self._start) * 1000
+        for phase in self._frame:
+            if phase not in self.samples:
+                self.phases.append(phase)
+                self.samples[phase] = deque(maxlen=self.window)
+        for phase in self.phases:
+            self.samples[phase].append(self._frame.get(phase, 0.0))
+        self.totals.append(total)
+        self.frames += 1
+        if total > self.budget_ms:
+            self.missed += 1
+
+    def report(self):
+        """Rows of (phase, p50, p95, p99, max) in ms over the window, ending with the whole frame."""
+        rows = []
+        for phase in self.phases:
+            values = sorted(self.samples[phase])
+            rows.append((phase, percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99),
+                         values[-1] if values else 0.0))
+        values = sorted(self.totals)
+        rows.append(('frame', percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99),
+                     values[-1] if values else 0.0))
+        return rows
+
+    def dump_csv(self, filename):
+        with open(filename, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['phase', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+            for phase, *values in self.report():
+                writer.writerow([phase] + [f'{v:.3f}' for v in values])
+            writer.writerow([])
+            writer.writerow(['frames', self.frames])
+            writer.writerow(['missed_budget', self.missed])
+            writer.writerow(['budget_ms', f'{self.budget_ms:.2f}'])
+
+    def draw(self, surface, font, pos=(8, 60), interval=0.25):
+        """Blit the HUD; the panel is rebuilt at most every `interval` seconds."""
+        import pygame
+        from settings import BLACK
+        now = time.perf_counter()
+        if self._hud is None or now - self._hud_time >= interval:
+            self._hud_time = now
+            lines = [f'{"phase":12}{"p50":>7}{"p95":>7}{"p99":>7}  ms']
+            for phase, p50, p95, p99, _ in self.report():
+                lines.append(f'{phase:12}{p50:7.2f}{p95:7.2f}{p99:7.2f}')
+            lines.append(f'missed budget ({self.budget_ms:.1f} ms): {self.missed}/{self.frames}')
+            # the numbers change every rebuild, so render them uncached
+            texts = [font.render(line, True, BLACK) for line in lines]
+            w = max(t.get_width() for t in texts) + 12
+            h = sum(t.get_height() for t in texts) + 10
+            panel = pygame.Surface((w, h), pygame.SRCALPHA)
+            panel.fill((255, 255, 255, 200))
+            y = 5
+            for t in texts:
+                panel.blit(t, (6, y))
+                y += t.get_height()
+            self._hud = panel
+        surface.blit(self._hud, pos)
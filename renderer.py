@@ -0,0 +1,157 @@
+# renderer.py
+# Layered, cached renderer for the hex map screen.
+import pygame
+from settings import TAN
+from hexgrid import Camera, axial_to_pixel, hex_corners, terrain_color, HEX_OUTLINE, HIGHLIGHT
+
+LAYER_TERRAIN = 'terrain'
+LAYER_HIGHLIGHT = 'highlight'
+LAYER_UNITS = 'units'
+LAYER_UI = 'ui'
+LAYERS = (LAYER_TERRAIN, LAYER_HIGHLIGHT, LAYER_UNITS, LAYER_UI)
+
+
+class MapRenderer:
+    """Composites the map screen from four cached full-screen layers:
+    terrain (opaque, baked once per terrain map), move highlights, units and UI.
+
+    Each frame the caller hands over the current state with set_terrain /
+    set_highlight / set_units / begin_ui; a layer is only redrawn when its key
+    changed or it was marked dirty, so a steady frame is a few blits.
+
+    The map layers are drawn through a Camera and only for the hexes and units
+    in view; set_camera re-bakes them when the view pans or zooms.
+    """
+
+    def __init__(self, size, camera=None):
+        self.size = size
+        self.camera = camera if camera is not None else Camera(*size)
+        self._camera_key = self.camera.key
+        self.layers = {
+            LAYER_TERRAIN: pygame.Surface(size),
+            LAYER_HIGHLIGHT: pygame.Surface(size, pygame.SRCALPHA),
+            LAYER_UNITS: pygame.Surface(size, pygame.SRCALPHA),
+            LAYER_UI: pygame.Surface(size, pygame.SRCALPHA),
+        }
+        self.menu_background = pygame.Surface(size)
+        self._menu_stale = True
+        self.keys = dict.fromkeys(LAYERS)
+        self.dirty = set(LAYERS)
+        self._polygons = {}  # (q, r) -> corner points at the current origin and size
+        self._coords = ()
+        self._terrain_map = {}
+        self._highlight = ()
+        self._units = ()
+        self._font = None
+        self.profiler = None  # optional FrameProfiler; layer redraws are marked as phases
+
+    def polygon(self, q, r):
+        """Cached corner points of the hex at (q, r) for the current camera."""
+        pts = self._polygons.get((q, r))
+        if pts is None:
+            x, y = axial_to_pixel(q, r, camera=self.camera)
+            pts = self._polygons[(q, r)] = hex_corners(x, y, self.camera.hex_size)
+        return pts
+
+    def mark_dirty(self, *layers):
+        self.dirty.update(layers or LAYERS)
+
+    def _update(self, layer, key):
+        # Remember the new key; True if the layer needs redrawing
+        if key != self.keys[layer]:
+            self.keys[layer] = key
+            self.dirty.add(layer)
+        return layer in self.dirty
+
+    def set_camera(self, camera):
+        """Use `camera`; if the view changed, the map layers are redrawn."""
+        self.camera = camera
+        if camera.key != self._camera_key:
+            self._camera_key = camera.key
+            self._polygons.clear()
+            self.mark_dirty(LAYER_TERRAIN, LAYER_HIGHLIGHT, LAYER_UNITS)
+
+    def set_terrain(self, coords, terrain_map, version=None):
+        self._coords = coords
+        self._terrain_map = terrain_map or {}
+        self._update(LAYER_TERRAIN, (id(coords), id(terrain_map), version))
+
+    def set_highlight(self, coords):
+        self._highlight = coords or ()
+        self._update(LAYER_HIGHLIGHT, tuple(self._highlight))
+
+    def set_units(self, units, font):
+        self._units = units
+        self._font = font
+        self._update(LAYER_UNITS, tuple((u.unit_id, u.q, u.r, u.hp, u.alive) for u in units))
+
+    def begin_ui(self, key):
+        """Returns the UI layer, cleared, if it needs redrawing for `key`; else None."""
+        if not self._update(LAYER_UI, key):
+            return None
+        self.dirty.discard(LAYER_UI)
+        surface = self.layers[LAYER_UI]
+        surface.fill((0, 0, 0, 0))
+        return surface
+
+    def _draw_hexes(self, surface):
+        for (q, r) in self.camera.visible(self._coords):
+            pts = self.polygon(q, r)
+            pygame.draw.polygon(surface, terrain_color(self._terrain_map.get((q, r))), pts)
+            pygame.draw.polygon(surface, HEX_OUTLINE, pts, 2)
+
+    def _mark(self, phase):
+        if self.profiler is not None:
+            self.profiler.mark(phase)
+
+    def _redraw(self):
+        if LAYER_TERRAIN in self.dirty:
+            surface = self.layers[LAYER_TERRAIN]
+            surface.fill(TAN)
+            self._draw_hexes(surface)
+            self._menu_stale = True
+            self._mark('draw_map')
+        if LAYER_HIGHLIGHT in self.dirty:
+            surface = self.layers[LAYER_HIGHLIGHT]
+            surface.fill((0, 0, 0, 0))
+            camera = self.camera
+            for (q, r) in self._highlight:
+                if camera.on_screen(q, r):
+                    pygame.draw.polygon(surface, HIGHLIGHT, self.polygon(q, r), 0)
+            self._mark('highlight')
+        if LAYER_UNITS in self.dirty:
+            surface = self.layers[LAYER_UNITS]
+            surface.fill((0, 0, 0, 0))
+            camera = self.camera
+            for u in self._units:
+                if camera.on_screen(u.q, u.r):
+                    u.draw(surface, self._font, camera)
+            self._mark('units')
+        self.dirty -= {LAYER_TERRAIN, LAYER_HIGHLIGHT, LAYER_UNITS}
+
+    def draw(self, screen):
+        """Blit the map layers and the UI layer."""
+        self._redraw()
+        screen.blit(self.layers[LAYER_TERRAIN], (0, 0))
+        if self._highlight:
+            screen.blit(self.layers[LAYER_HIGHLIGHT], (0, 0))
+        screen.blit(self.layers[LAYER_UNITS], (0, 0))
+        screen.blit(self.layers[LAYER_UI], (0, 0))
+        self._mark('blit')
+
+    def draw_menu(self, screen):
+        """Blit the faded map background and the UI layer for the title screen."""
+        self._redraw()
+        if self._menu_stale:
+            # The menu shows the map at alpha 140 over a black-backed sheet;
+            # built only when the title screen is actually shown
+            faded = pygame.Surface(self.size)
+            self._draw_hexes(faded)
+            faded.set_alpha(140)
+            self.menu_background.fill(TAN)
+            self.menu_background.blit(faded, (0, 0))
+            self._menu_stale = False
+            self._mark('draw_map')
+        screen.blit(self.menu_background, (0, 0))
+        screen.blit(self.layers[LAYER_UI], (0, 0))
+        self._mark('blit')
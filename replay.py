@@ -0,0 +1,204 @@
+# replay.py
+# Game recordings (seed, action list, keyframes) and a player that can jump to any round.
+# Usage: python replay.py tinyhex_replay.json [--turn 12] [--view]
+import argparse
+import bisect
+import json
+
+# Action codes; an action is a tuple (code, *args) with units given by roster index
+ACT_MOVE, ACT_ATTACK, ACT_END_TURN = range(3)
+
+
+class Replay:
+    """Recording of one game. The seed recreates the map and the spawn, the
+    actions are every move, attack and end of phase in order, and a keyframe
+    (round, action index, engine snapshot) is kept at the start of every
+    `keyframe_every`-th round.
+    """
+
+    def __init__(self, seed, radius, max_units, keyframe_every=5):
+        self.seed = seed
+        self.radius = radius
+        self.max_units = max_units
+        self.keyframe_every = keyframe_every
+        self.actions = []
+        self.keyframes = []
+        self.winner = None
+        self.turns = 0
+
+    def record_move(self, unit, q, r):
+        self.actions.append((ACT_MOVE, unit, q, r))
+
+    def record_attack(self, attacker, target):
+        self.actions.append((ACT_ATTACK, attacker, target))
+
+    def record_end_turn(self):
+        self.actions.append((ACT_END_TURN,))
+
+    def add_keyframe(self, turn, state):
+        self.keyframes.append((turn, len(self.actions), state))
+
+    def finish(self, winner, turns):
+        self.winner = winner
+        self.turns = turns
+
+    def to_dict(self):
+        return {
+            'seed': self.seed, 'radius': self.radius, 'max_units': self.max_units,
+            'keyframe_every': self.keyframe_every, 'winner': self.winner, 'turns': self.turns,
+            'actions': self.actions, 'keyframes': self.keyframes,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        replay = cls(d['seed'], d['radius'], d['max_units'], d['keyframe_every'])
+        replay.actions = [tuple(a) for a in d['actions']]
+        replay.keyframes = [tuple(k) for k in d['keyframes']]
+        replay.winner = d['winner']
+        replay.turns = d['turns']
+        return replay
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class ReplayPlayer:
+    """Steps through a Replay on a fresh engine rebuilt from its seed.
+
+    seek() restores the last keyframe at or before the wanted round and applies
+    only the actions after it, so a jump costs at most `keyframe_every` rounds of
+    actions wherever it lands.
+    """
+
+    def __init__(self, replay):
+        from engine import GameEngine  # engine.py imports this module
+        self.replay = replay
+        self.engine = GameEngine(replay.radius, replay.max_units, ai_weights={},
+                                 keyframe_every=replay.keyframe_every)
+        self.engine.reset(replay.seed)
+        self.position = 0  # index of the next action
+        self._keyframe_turns = [k[0] for k in replay.keyframes]
+
+    @property
+    def turn(self):
+        return self.engine.stats.turns
+
+    @property
+    def done(self):
+        return self.position >= len(self.replay.actions)
+
+    def step(self):
+        """Apply the next action; returns it, or None at the end."""
+        if self.done:
+            return None
+        action = self.replay.actions[self.position]
+        self.position += 1
+        engine = self.engine
+        roster = engine.roster
+        if action[0] == ACT_MOVE:
+            unit = roster[action[1]]
+            unit.move_to(action[2], action[3])
+            unit.has_moved = True
+        elif action[0] == ACT_ATTACK:
+            attacker = roster[action[1]]
+            attacker.try_attack(roster[action[2]], terrain_map=engine.terrain_map, rng=engine.rng)
+            attacker.has_attacked = True
+        else:
+            engine.end_turn()
+            engine.remove_dead()
+        return action
+
+    def seek(self, turn):
+        """Jump to the start of round `turn` (or the end of the game if it is earlier)."""
+        i = bisect.bisect_right(self._keyframe_turns, turn) - 1
+        # Restore unless we are in an earlier round already past that keyframe, where stepping on is shorter
+        if i >= 0 and not (self._keyframe_turns[i] <= self.turn < turn):
+            _, self.position, state = self.replay.keyframes[i]
+            self.engine.restore(state)
+        while self.turn < turn and not self.done:
+            self.step()
+
+    def run(self):
+        """Play to the end of the recording."""
+        while not self.done:
+            self.step()
+
+
+def describe(engine):
+    lines = [f'round {engine.stats.turns}, {"player" if engine.current_turn == 0 else "AI"} phase']
+    for u in engine.roster:
+        if u.alive:
+            kind = 'Archer' if hasattr(u, 'range') else 'Ground'
+            lines.append(f'  {"player" if u.owner == 0 else "AI":6} {kind:6} at ({u.q},{u.r}) hp {u.hp}')
+    return '\n'.join(lines)
+
+
+def view(player):
+    """Minimal window: left/right step a round, Home/End jump to the start/end."""
+    import pygame
+    from settings import SCREEN_WIDTH, SCREEN_HEIGHT, BLACK, FPS
+    from renderer import MapRenderer
+    import ui
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption('TinyHex replay')
+    font = pygame.font.SysFont('Arial', 16)
+    clock = pygame.time.Clock()
+    renderer = MapRenderer((SCREEN_WIDTH, SCREEN_HEIGHT))
+    engine = player.engine
+    last = player.replay.turns
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_RIGHT:
+                    player.seek(min(last, player.turn + 1))
+                elif event.key == pygame.K_LEFT:
+                    player.seek(max(0, player.turn - 1))
+                elif event.key == pygame.K_HOME:
+                    player.seek(0)
+                elif event.key == pygame.K_END:
+                    player.run()
+        renderer.set_terrain(engine.map_coords, engine.terrain_map, engine.grid.terrain_version)
+        renderer.set_highlight(())
+        renderer.set_units([u for u in engine.roster if u.alive], font)
+        layer = renderer.begin_ui(player.turn)
+        if layer:
+            layer.blit(ui.render_text(font, f'Round {player.turn} / {last}  (left/right, Home/End)', BLACK), (8, 8))
+        renderer.draw(screen)
+        pygame.display.flip()
+        clock.tick(FPS)
+    pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect a recorded TinyHex game.')
+    parser.add_argument('replay', help='replay file saved by Replay.save')
+    parser.add_argument('--turn', type=int, default=None, help='jump to the start of this round')
+    parser.add_argument('--view', action='store_true', help='open a window to step through the game')
+    args = parser.parse_args(argv)
+    replay = Replay.load(args.replay)
+    player = ReplayPlayer(replay)
+    if args.view:
+        view(player)
+        return player
+    if args.turn is None:
+        player.run()
+    else:
+        player.seek(args.turn)
+    print(f'seed {replay.seed}, {len(replay.actions)} actions, {len(replay.keyframes)} keyframes, '
+          f'winner {replay.winner} after {replay.turns} rounds')
+    print(describe(player.engine))
+    return player
+
+
+if __name__ == '__main__':
+    main()
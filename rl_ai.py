@@ -2,10 +2,21 @@
 # Uses weighted heuristics that improve through self-play
 
 import random
+import time
 import json
 import os
-from entities import Unit
-from astar import astar
+from collections import Counter
+import entities
+from entities import Unit, UnitRegistry
+from astar import astar, FlowFieldCache
+from hexgrid import HexGrid, TERRAIN_CODES, PLAIN, FOREST_CODE, ROCK_CODE
+from combat import combat_odds
+
+# NumPy is optional: without it target scoring falls back to the scalar path
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class RLAI:
@@ -23,14 +34,31 @@ class RLAI:
         'formation_weight': 0.4,           # Prefer staying near allies
     }
     
-    def __init__(self, units, map_coords, terrain_map=None, record_attack=None, weights_file='rl_weights.json'):
+    # Score all unit x target pairs at once with NumPy (BatchScorer) when available.
+    # Below batch_min_pairs pairs the scalar path is cheaper than building arrays.
+    batch_scoring = np is not None
+    batch_min_pairs = 100
+    
+    def __init__(self, units, map_coords, terrain_map=None, record_attack=None, weights_file='rl_weights.json', owner=1,
+                 registry=None, record_move=None, rng=random):
         self.units = units
+        # O(1) occupancy and per-owner rosters; shared with the engine when it passes one in
+        self.registry = registry if registry is not None else UnitRegistry(units)
+        self.owner = owner  # side this AI plays (1 = AI, 0 = player side in AI-vs-AI games)
         self.map_coords = map_coords
+        # Array tables when the map is a HexGrid (its terrain array mirrors terrain_map)
+        self.grid = map_coords if isinstance(map_coords, HexGrid) else None
+        # Per-goal distance maps shared by all units chasing the same target
+        self.flow = FlowFieldCache(self.grid) if self.grid is not None else None
         self.terrain_map = terrain_map or {}
         self.record_attack = record_attack
+        self.record_move = record_move
+        self.rng = rng  # combat rolls; the engine passes its per-game RNG
+        self.odds = combat_odds()  # exact attack odds (combat.py)
         self.weights_file = weights_file
         self.weights = self.load_weights()
         self.game_history = []  # Track decisions for learning
+        self.focus_counts = None  # target -> allies whose last attack hit it; kept during take_actions
         
     def load_weights(self):
         """Load learned weights from file, or use defaults."""
@@ -83,28 +111,53 @@ class RLAI:
         self.save_weights()
         self.game_history = []
     
+    def next_step(self, unit, target):
+        """First step on a shortest path from unit toward target, or None."""
+        if self.flow is not None:
+            return self.flow.next_step((unit.q, unit.r), (target.q, target.r))
+        path = astar((unit.q, unit.r), (target.q, target.r), self.map_coords,
+                     self.terrain_map, block_terrain=['rock'])
+        return path[1] if len(path) > 1 else None
+    
+    def distance(self, a, b):
+        """Hex distance between two units, from the grid's distance table when available."""
+        if self.grid is not None:
+            index = self.grid.index
+            return self.grid.distance_row(index[(a.q, a.r)])[index[(b.q, b.r)]]
+        return a.distance_to(b)
+    
+    def terrain_at(self, coord):
+        """Terrain code (hexgrid.PLAIN / FOREST_CODE / ROCK_CODE) at coord."""
+        if self.grid is not None:
+            return self.grid.terrain[self.grid.index[coord]]
+        return TERRAIN_CODES.get(self.terrain_map.get(coord), PLAIN)
+    
     def evaluate_target(self, ai_unit, target, player_units):
         """Score how attractive a target is (higher = better)."""
         if not target.alive:
             return -1000
         
-        # Base score from HP (lower is better)
-        hp_score = (target.max_hp - target.hp) / target.max_hp
+        # Base score from HP (lower is better), plus the chance one attack finishes it
+        odds = self.odds
+        target_forest = self.terrain_at((target.q, target.r)) == FOREST_CODE
+        hp_score = ((target.max_hp - target.hp) / target.max_hp +
+                    odds.kill_chance(ai_unit.hp, target.hp, ai_unit.attack, target_forest))
         
         # Distance score (closer is better)
-        distance = ai_unit.distance_to(target)
+        distance = self.distance(ai_unit, target)
         distance_score = 1.0 / (distance + 1)
         
-        # Threat score: how much damage does target do?
-        threat_score = target.attack / 10.0  # Normalized by typical attack value
+        # Threat score: share of our remaining hp the target's attack takes on average
+        own_forest = self.terrain_at((ai_unit.q, ai_unit.r)) == FOREST_CODE
+        threat_score = odds.expected_damage(target.hp, ai_unit.hp, target.attack, own_forest) / max(1, ai_unit.hp)
         
         # Ranged threat (Longbows are more dangerous)
         if hasattr(target, 'range'):
             threat_score *= 1.5
         
         # Coordination score: are allies already attacking this target?
-        allies_attacking = sum(1 for u in [u2 for u2 in self.units if u2.owner == 1 and u2.alive and u2 != ai_unit]
-                              if hasattr(u, 'last_attack_target') and u.last_attack_target == target)
+        focus = self.focus_counts if self.focus_counts is not None else self.count_focus()
+        allies_attacking = focus[target] - (getattr(ai_unit, 'last_attack_target', None) is target)
         focus_score = allies_attacking * 0.2
         
         # Composite score using learned weights
@@ -122,23 +175,18 @@ class RLAI:
         safety = 1.0
         
         # Count enemies adjacent to this position
-        q, r = position
-        adjacent_enemies = 0
-        for dq, dr in [(1,0), (1,-1), (0,-1), (-1,0), (-1,1), (0,1)]:
-            check = (q + dq, r + dr)
-            if any(u.alive and u.owner == 0 and u.q == check[0] and u.r == check[1] for u in self.units):
-                adjacent_enemies += 1
+        adjacent_enemies = self.registry.adjacent_enemies(position, self.owner)
         
         # Penalize being surrounded
         safety -= adjacent_enemies * self.weights['safety_weight'] * 0.2
         
         # Bonus for terrain defense
-        if self.terrain_map.get(position) == 'forest':
+        if self.terrain_at(position) == FOREST_CODE:
             safety += self.weights['terrain_defense_weight'] * 0.3
         
         # Bonus for being near allies
-        ally_distance = min([ai_unit.distance_to(u) for u in self.units 
-                            if u.owner == 1 and u.alive and u != ai_unit] or [5])
+        ally_distance = min([self.distance(ai_unit, u) for u in self.registry.alive(self.owner)
+                            if u != ai_unit] or [5])
         if ally_distance <= 2:
             safety += self.weights['formation_weight'] * (2 - ally_distance) * 0.1
         
@@ -151,9 +199,7 @@ class RLAI:
             return True
         
         # Retreat if surrounded
-        q, r = ai_unit.q, ai_unit.r
-        adjacent_enemies = sum(1 for dq, dr in [(1,0), (1,-1), (0,-1), (-1,0), (-1,1), (0,1)]
-                              if any(u.alive and u.owner == 0 and u.q == q+dq and u.r == r+dr for u in self.units))
+        adjacent_enemies = self.registry.adjacent_enemies((ai_unit.q, ai_unit.r), self.owner)
         if adjacent_enemies >= 3:
             return True
         
@@ -162,9 +208,8 @@ class RLAI:
     def find_retreat_position(self, ai_unit, player_units):
         """Find safest position to move to."""
         possible = ai_unit.possible_moves(self.map_coords, self.terrain_map)
-        occupied = {(u.q, u.r) for u in self.units if u.alive and u != ai_unit}
-        valid = [p for p in possible if p not in occupied and 
-                self.terrain_map.get(p) != 'rock']
+        valid = [p for p in possible if not self.registry.is_occupied(p) and
+                self.terrain_at(p) != ROCK_CODE]
         
         if not valid:
             return None
@@ -174,77 +219,92 @@ class RLAI:
     
     def take_actions(self):
         """Main AI turn: move and attack all units."""
-        ai_units = [u for u in self.units if u.owner == 1 and u.alive]
-        player_units = [u for u in self.units if u.owner == 0 and u.alive]
+        for _ in self.iter_actions():
+            pass
+    
+    def iter_actions(self):
+        """The AI turn as a generator: yields each unit right after it has acted,
+        so the turn can be spread over several frames (see AITurn)."""
+        ai_units = list(self.registry.alive(self.owner))
+        player_units = self.registry.enemies(self.owner)
         
         if not player_units:
             return
         
-        for u in ai_units:
-            if not player_units:
-                break
-            
-            # Check if should retreat
-            if self.should_retreat(u):
-                retreat_pos = self.find_retreat_position(u, player_units)
-                if retreat_pos and not u.has_moved:
-                    u.q, u.r = retreat_pos
-                    u.has_moved = True
-                    self.game_history.append({'action': 'retreat', 'unit': u.name})
-                continue
-            
-            # Pick best target using learned weights
+        self.focus_counts = self.count_focus()
+        scorer = None
+        if self.batch_scoring and np is not None and len(ai_units) * len(player_units) >= self.batch_min_pairs:
+            scorer = BatchScorer(self, ai_units, player_units)
+        try:
+            for u in ai_units:
+                if not player_units:
+                    break
+                self.act(u, player_units, scorer)
+                yield u
+        finally:
+            self.focus_counts = None
+    
+    def act(self, u, player_units, scorer=None):
+        """Move and/or attack with one unit."""
+        # Check if should retreat
+        if self.should_retreat(u):
+            retreat_pos = self.find_retreat_position(u, player_units)
+            if retreat_pos and not u.has_moved:
+                u.move_to(*retreat_pos)
+                if self.record_move:
+                    self.record_move(u, *retreat_pos)
+                u.has_moved = True
+                self.game_history.append({'action': 'retreat', 'unit': u.name})
+            return
+        
+        # Pick best target using learned weights
+        if scorer is not None:
+            target = scorer.best_target(u)
+        else:
             targets_with_scores = [(t, self.evaluate_target(u, t, player_units)) 
                                   for t in player_units]
             targets_with_scores.sort(key=lambda x: x[1], reverse=True)
             target = targets_with_scores[0][0]
-            
-            # Try ranged attack if unit has it
-            if hasattr(u, 'range') and not u.has_attacked:
-                if u.can_attack(target, self.units, self.terrain_map):
-                    self._execute_attack(u, target)
-                    u.has_moved = True
-                    continue
-            
-            # Try melee attack if adjacent
-            if u.distance_to(target) <= 1 and not u.has_attacked:
-                self._execute_attack(u, target)
+        if not target.alive:
+            # Dead targets score lowest, so every enemy is gone
+            return
+
+        # Try ranged attack if unit has it
+        if hasattr(u, 'range') and not u.has_attacked:
+            if u.can_attack(target, self.units, self.terrain_map, self.grid):
+                self._execute_attack(u, target, scorer)
                 u.has_moved = True
-                continue
-            
-            # Otherwise move toward target using A*
-            if not u.has_moved:
-                occupied = {(other.q, other.r) for other in self.units 
-                           if other.alive and other != u}
-                path = astar((u.q, u.r), (target.q, target.r), self.map_coords,
-                            self.terrain_map, block_terrain=['rock'])
-                
-                if path and len(path) > 1:
-                    next_step = path[1]
-                    if next_step not in occupied:
-                        u.q, u.r = next_step
-                        u.has_moved = True
-                        
-                        # Track if moved to terrain
-                        if self.terrain_map.get(next_step) == 'forest':
-                            self.game_history.append({'action': 'move', 'used_terrain': True})
-            
-            u.has_attacked = False
-    
-    def _execute_attack(self, attacker, target):
-        """Execute attack and record it."""
-        # Animate attack (animation stubs replaced by main.py)
-        if hasattr(attacker, 'animate_attack'):
-            attacker.animate_attack(screen_stub(), target, stub_font())
+                return
         
-        hit, dmg = attacker.try_attack(target, terrain_map=self.terrain_map, stats=None, turn=None)
+        # Try melee attack if adjacent
+        if self.distance(u, target) <= 1 and not u.has_attacked:
+            self._execute_attack(u, target, scorer)
+            u.has_moved = True
+            return
         
-        if self.record_attack:
-            self.record_attack(1, hit, dmg)
+        # Otherwise move toward target (flow field on a HexGrid, else A*)
+        if not u.has_moved:
+            next_step = self.next_step(u, target)
+            if next_step is not None and not self.registry.is_occupied(next_step):
+                u.move_to(*next_step)
+                if self.record_move:
+                    self.record_move(u, *next_step)
+                u.has_moved = True
+                
+                # Track if moved to terrain
+                if self.terrain_at(next_step) == FOREST_CODE:
+                    self.game_history.append({'action': 'move', 'used_terrain': True})
         
-        attacker.last_attack_result = (hit, dmg, target)
-        attacker.last_attack_target = target  # Track for focus fire
-        attacker.has_attacked = True
+        u.has_attacked = False
+    
+    def count_focus(self):
+        """Count, per target, the living allies whose last attack was at it."""
+        return Counter(u.last_attack_target for u in self.registry.alive(self.owner)
+                       if getattr(u, 'last_attack_target', None) is not None)
+    
+    def _execute_attack(self, attacker, target, scorer=None):
+        """Execute attack and record it."""
+        hit, dmg = self.resolve_attack(attacker, target, scorer)
         
         self.game_history.append({
             'action': 'attack',
@@ -256,11 +316,153 @@ class RLAI:
         # Check if survived weak position
         if hit and target.hp > 0:
             self.game_history[-1]['survived_weak'] = target.hp < target.max_hp / 2
+    
+    def resolve_attack(self, attacker, target, scorer=None):
+        """Roll the attack, record it and update the focus-fire state. Returns (hit, dmg)."""
+        # Animate attack (queue stub replaced by main.py; headless games skip it)
+        queue = entities.animation_queue()
+        if queue is not None and hasattr(attacker, 'animate_attack'):
+            attacker.animate_attack(queue, target)
+        
+        hit, dmg = attacker.try_attack(target, terrain_map=self.terrain_map, stats=None, turn=None, rng=self.rng)
+        
+        if self.record_attack:
+            self.record_attack(self.owner, hit, dmg, attacker, target)
+        
+        attacker.last_attack_result = (hit, dmg, target)
+        previous = getattr(attacker, 'last_attack_target', None)
+        if self.focus_counts is not None:
+            if previous is not None:
+                self.focus_counts[previous] -= 1
+            self.focus_counts[target] += 1
+        if scorer is not None:
+            scorer.record_attack(attacker, previous, target)
+        attacker.last_attack_target = target  # Track for focus fire
+        attacker.has_attacked = True
+        return hit, dmg
+
+
+_odds_tables = {}
+
+
+def _odds_arrays(odds):
+    # CombatOdds kill chances and expected damage as arrays [attack, forest, attacker hp, defender hp]
+    arrays = _odds_tables.get(id(odds))
+    if arrays is None:
+        shape = (odds.max_attack + 1, 2, odds.max_hp + 1, odds.max_hp + 1)
+        arrays = _odds_tables[id(odds)] = (np.array([k[1] for k in odds.kills]).reshape(shape),
+                                           np.array(odds.expected).reshape(shape))
+    return arrays
 
 
-# Stubs for animation calls
-def screen_stub():
-    return None
+class BatchScorer:
+    """Scores every (AI unit, target) pair of one turn with NumPy.
 
-def stub_font():
-    return None
+    Uses the same formula, weights and order of operations as
+    RLAI.evaluate_target, so scores and picks match the scalar path exactly.
+    The full matrix is computed once per turn; after an attack only the
+    target arrays change, and rows are recomputed from them on demand.
+    """
+
+    def __init__(self, ai, ai_units, targets):
+        self.weights = ai.weights
+        self.targets = targets
+        self.row = {u: i for i, u in enumerate(ai_units)}
+        self.col = {t: j for j, t in enumerate(targets)}
+        self.hp = np.array([t.hp for t in targets], dtype=float)
+        self.max_hp = np.array([t.max_hp for t in targets], dtype=float)
+        self.alive = np.array([t.alive for t in targets], dtype=bool)
+        # Combat odds lookups: the AI units' hp don't change during their turn,
+        # the targets' hp are read from self.hp when the scores are computed
+        self.kill, self.expected = _odds_arrays(ai.odds)
+        self.top = ai.odds.max_hp
+        forest = [ai.terrain_at((t.q, t.r)) == FOREST_CODE for t in targets]
+        own_forest = [ai.terrain_at((u.q, u.r)) == FOREST_CODE for u in ai_units]
+        own_hp = np.array([u.hp for u in ai_units], dtype=np.int64)
+        self.own_hp = np.clip(own_hp, 0, self.top)[:, None]
+        self.own_attack = np.array([u.attack for u in ai_units], dtype=np.int64)[:, None]
+        self.own_forest = np.array(own_forest, dtype=np.int64)[:, None]
+        self.own_hp_divisor = np.maximum(1, own_hp).astype(float)[:, None]
+        self.attack = np.array([t.attack for t in targets], dtype=np.int64)[None, :]
+        self.forest = np.array(forest, dtype=np.int64)[None, :]
+        self.ranged = np.where([hasattr(t, 'range') for t in targets], 1.5, 1.0)
+        focus = ai.focus_counts if ai.focus_counts is not None else ai.count_focus()
+        self.focus = np.array([focus[t] for t in targets], dtype=np.int64)
+        self.own_target = np.array([self.col.get(getattr(u, 'last_attack_target', None), -1)
+                                    for u in ai_units], dtype=np.int64)
+        aq = np.array([u.q for u in ai_units])[:, None]
+        ar = np.array([u.r for u in ai_units])[:, None]
+        tq = np.array([t.q for t in targets])[None, :]
+        tr = np.array([t.r for t in targets])[None, :]
+        dist = np.maximum(np.maximum(np.abs(aq - tq), np.abs(ar - tr)), np.abs(aq + ar - tq - tr))
+        self.distance_score = 1.0 / (dist + 1)
+        self.matrix = self.scores()
+        self.dirty = False
+
+    def scores(self, rows=slice(None)):
+        """Score matrix for the given AI unit rows against all targets."""
+        w = self.weights
+        hp = np.clip(self.hp, 0, self.top).astype(np.int64)[None, :]
+        own_hp = self.own_hp[rows]
+        kill = self.kill[self.own_attack[rows], self.forest, own_hp, hp]
+        hp_score = (self.max_hp - self.hp) / self.max_hp + kill
+        threat = self.expected[self.attack, self.own_forest[rows], hp, own_hp] / self.own_hp_divisor[rows]
+        threat = threat * self.ranged
+        own = self.own_target[rows]
+        allies_attacking = self.focus - (np.asarray(own)[..., None] == np.arange(len(self.targets)))
+        score = (
+            w['target_hp_weight'] * hp_score +
+            w['target_distance_weight'] * self.distance_score[rows] +
+            w['target_threat_weight'] * threat +
+            w['focus_fire_weight'] * (allies_attacking * 0.2)
+        )
+        return np.where(self.alive, score, -1000.0)
+
+    def best_target(self, ai_unit):
+        i = self.row[ai_unit]
+        row = self.scores(i) if self.dirty else self.matrix[i]
+        # argmax keeps the first of equal scores, like the stable sort in take_actions
+        return self.targets[int(np.argmax(row))]
+
+    def record_attack(self, attacker, previous, target):
+        j = self.col.get(target)
+        if j is not None:
+            self.hp[j] = target.hp
+            self.alive[j] = target.alive
+            self.focus[j] += 1
+        p = self.col.get(previous)
+        if p is not None:
+            self.focus[p] -= 1
+        i = self.row.get(attacker)
+        if i is not None:
+            self.own_target[i] = -1 if j is None else j
+        self.dirty = True
+
+
+class AITurn:
+    """An AI turn run a time slice at a time.
+
+    step(budget_ms) lets units act until the budget is spent (always at least
+    one) and returns the units that acted; `done` is set once every unit has
+    had its go. Nothing else may change the game between steps. The units act
+    through `actions`, a generator like ai.iter_actions() (the default) or
+    planner.AIPlanner.apply().
+    """
+
+    def __init__(self, ai, actions=None):
+        self.ai = ai
+        self.actions = actions if actions is not None else ai.iter_actions()
+        self.done = False
+        self.acted = 0
+
+    def step(self, budget_ms):
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        acted = []
+        for u in self.actions:
+            acted.append(u)
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            self.done = True
+        self.acted += len(acted)
+        return acted
@@ -26,4 +26,11 @@ MAX_UNITS = 12
 # Terrain types
 TERRAIN_PLAIN = 'plain'
 TERRAIN_FOREST = 'forest'  # reduces movement effectiveness
-TERRAIN_ROCK = 'rock'      # blocks movement & line-of-sight
\ No newline at end of file
+TERRAIN_ROCK = 'rock'      # blocks movement & line-of-sight
+
+# Movement cost to enter a hex; rock is impassable
+MOVE_COST_PLAIN = 1
+MOVE_COST_FOREST = 2
+
+# Milliseconds per frame the AI may spend on its turn; the turn is spread over frames
+AI_FRAME_BUDGET_MS = 6
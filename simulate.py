@@ -0,0 +1,91 @@
+# simulate.py
+# Headless AI-vs-AI simulation; reports games/sec.
+# Usage: python simulate.py --games 1000 [--radius 3] [--weights-a rl_weights.json] [--weights-b rl_weights.json]
+#        [--ai-a simple] [--ai-b mcts]
+#        [--log events.bin | --db tinyhex.db]
+import argparse
+import time
+from settings import MAP_RADIUS, MAX_UNITS
+from ai import AI_TYPES
+from engine import GameEngine
+from eventlog import EventLog
+from warehouse import Warehouse
+
+
+def simulate(games, radius=MAP_RADIUS, max_units=MAX_UNITS, weights_a='rl_weights.json',
+             weights_b='rl_weights.json', max_turns=100, log=None, seed=None, ai_a='simple', ai_b='simple'):
+    """Play `games` AI-vs-AI games. Side 0 uses weights_a, side 1 uses weights_b;
+    ai_a / ai_b name their AI types (see ai.AI_TYPES).
+    `log` is an optional EventLog (or Warehouse) that receives every game's events;
+    `seed` makes the whole run reproducible.
+    Returns a dict with win counts, draws and games/sec (plus nodes/sec for MCTS sides).
+    """
+    engine = GameEngine(radius, max_units, ai_weights={0: weights_a, 1: weights_b}, event_log=log, seed=seed,
+                        ai_types={0: ai_a, 1: ai_b})
+    searched = {'side0': 0.0, 'side1': 0.0}
+    nodes = {'side0': 0, 'side1': 0}
+    results = {'Player': 0, 'AI': 0, None: 0}
+    turns = 0
+    start = time.perf_counter()
+    for i in range(games):
+        if i:
+            engine.reset()
+        results[engine.play(max_turns)] += 1
+        turns += engine.stats.turns
+        for side, ai in engine.ais.items():
+            # the AIs are rebuilt for every game, so collect their search totals now
+            if hasattr(ai, 'report'):
+                searched[f'side{side}'] += ai.search_time
+                nodes[f'side{side}'] += ai.nodes
+    if log is not None:
+        log.flush()
+    elapsed = time.perf_counter() - start
+    result = {
+        'games': games,
+        'side0_wins': results['Player'],
+        'side1_wins': results['AI'],
+        'draws': results[None],
+        'avg_turns': turns / games if games else 0,
+        'seconds': elapsed,
+        'games_per_sec': games / elapsed if elapsed > 0 else 0,
+    }
+    for side, ai_type in (('side0', ai_a), ('side1', ai_b)):
+        if ai_type == 'mcts':
+            result[f'{side}_nodes'] = nodes[side]
+            result[f'{side}_nodes_per_sec'] = nodes[side] / searched[side] if searched[side] else 0.0
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run headless TinyHex AI-vs-AI games.')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--radius', type=int, default=MAP_RADIUS)
+    parser.add_argument('--units', type=int, default=MAX_UNITS)
+    parser.add_argument('--max-turns', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=None, help='seed for a reproducible run')
+    parser.add_argument('--weights-a', default='rl_weights.json', help='weights file for side 0')
+    parser.add_argument('--weights-b', default='rl_weights.json', help='weights file for side 1')
+    parser.add_argument('--ai-a', default='simple', choices=AI_TYPES, help='AI type for side 0')
+    parser.add_argument('--ai-b', default='simple', choices=AI_TYPES, help='AI type for side 1')
+    sink = parser.add_mutually_exclusive_group()
+    sink.add_argument('--log', default=None, help='append every event to this log (.jsonl, or .bin for binary)')
+    sink.add_argument('--db', default=None, help='store games, units and attacks in this SQLite warehouse')
+    args = parser.parse_args(argv)
+    log = None
+    if args.log:
+        log = EventLog(args.log)
+    elif args.db:
+        log = Warehouse(args.db)
+    try:
+        result = simulate(args.games, args.radius, args.units, args.weights_a, args.weights_b, args.max_turns, log,
+                          args.seed, args.ai_a, args.ai_b)
+    finally:
+        if log is not None:
+            log.close()
+    for k, v in result.items():
+        print(f'{k}: {v:.2f}' if isinstance(v, float) else f'{k}: {v}')
+    return result
+
+
+if __name__ == '__main__':
+    main()
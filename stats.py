@@ -1,10 +1,18 @@
 # stats.py
-# Game statistics and CSV export
+# Game statistics and CSV export. With an event log attached, every spawn, move,
+# attack, death and turn change is also streamed to it (see eventlog.py).
 import csv
 import datetime
+from settings import TERRAIN_FOREST
+from eventlog import GAME_START, SPAWN, MOVE, ATTACK, DEATH, TURN, GAME_END, WINNER_CODES
 
 class GameStats:
-    def __init__(self):
+    def __init__(self, log=None, radius=0, max_units=0, terrain_map=None):
+        self.log = log
+        self.terrain_map = terrain_map or {}
+        self.game_id = log.new_game() if log is not None else None
+        if log is not None:
+            log.emit(GAME_START, self.game_id, 0, radius, max_units)
         self.turns = 0
         self.player_attacks = 0
         self.player_hits = 0
@@ -40,8 +48,27 @@ class GameStats:
             'final_r': unit.r,
             'alive': True
         }
+        if self.log is not None:
+            self.log.emit(SPAWN, self.game_id, self.turns, unit.unit_id, unit.owner,
+                          int(hasattr(unit, 'range')), unit.q, unit.r, unit.max_hp)
 
-    def record_attack(self, owner, hit, dmg):
+    def record_move(self, unit, q, r):
+        if self.log is not None:
+            self.log.emit(MOVE, self.game_id, self.turns, unit.unit_id, unit.owner, q, r)
+
+    def record_turn(self, side):
+        # A phase change; `side` is the side about to act
+        if self.log is not None:
+            self.log.emit(TURN, self.game_id, self.turns, side)
+
+    def record_attack(self, owner, hit, dmg, attacker=None, target=None):
+        if self.log is not None and attacker is not None:
+            roll = attacker.last_roll
+            self.log.emit(ATTACK, self.game_id, self.turns, attacker.unit_id, owner, target.unit_id,
+                          int(hit), dmg, int(self.terrain_map.get((target.q, target.r)) == TERRAIN_FOREST),
+                          -1.0 if roll is None else roll)
+            if hit and not target.alive:
+                self.log.emit(DEATH, self.game_id, self.turns, target.unit_id, target.owner, target.q, target.r)
         if owner == 0:
             self.player_attacks += 1
             if hit:
@@ -62,6 +89,8 @@ class GameStats:
     def set_winner(self, winner):
         self.winner = winner
         self.end_time = datetime.datetime.now()
+        if self.log is not None:
+            self.log.emit(GAME_END, self.game_id, self.turns, WINNER_CODES[winner])
 
     def summary(self):
         return {
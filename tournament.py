@@ -0,0 +1,177 @@
+# tournament.py
+# Round-robin AI-vs-AI tournament between rl_weights.json variants, played on all cores.
+# Usage: python tournament.py rl_weights.json candidate.json [more.json ...] --games 10000
+import argparse
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from settings import MAP_RADIUS, MAX_UNITS
+from engine import GameEngine
+
+ELO_SCALE = 400 / math.log(10)  # natural-log strength -> Elo points
+
+
+def play_chunk(weights_a, weights_b, games, seed, radius=MAP_RADIUS, max_units=MAX_UNITS, max_turns=100):
+    """Play `games` games with weights_a on side 0 and weights_b on side 1.
+    Runs in a worker process; returns (a_wins, b_wins, draws).
+    """
+    # Every chunk gets its own game seeds derived from the tournament seed, so
+    # results do not depend on which worker picks the chunk up.
+    engine = GameEngine(radius, max_units, ai_weights={0: weights_a, 1: weights_b}, seed=seed)
+    a_wins = b_wins = draws = 0
+    for i in range(games):
+        if i:
+            engine.reset()
+        winner = engine.play(max_turns)
+        if winner == 'Player':
+            a_wins += 1
+        elif winner == 'AI':
+            b_wins += 1
+        else:
+            draws += 1
+    return a_wins, b_wins, draws
+
+
+def _invert(matrix):
+    # Gauss-Jordan inverse for the small information matrix
+    n = len(matrix)
+    aug = [list(row) + [1.0 if i == j else 0.0 for j in range(n)] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda i: abs(aug[i][col]))
+        if abs(aug[pivot][col]) < 1e-12:
+            return None
+        aug[col], aug[pivot] = aug[pivot], aug[col]
+        p = aug[col][col]
+        aug[col] = [v / p for v in aug[col]]
+        for i in range(n):
+            if i != col and aug[i][col]:
+                f = aug[i][col]
+                aug[i] = [v - f * w for v, w in zip(aug[i], aug[col])]
+    return [row[n:] for row in aug]
+
+
+def elo_ratings(players, results, iterations=1000, z=1.96):
+    """Fit Bradley-Terry ratings (draws count as half a win) and return a list of
+    (player, elo, ci_half_width) in input order, with the first player anchored at 0.
+
+    `results` maps (i, j) player index pairs to [i_wins, j_wins, draws].
+    The confidence interval comes from the inverse of the observed information
+    matrix of the fit (the multi-player version of the delta method).
+    """
+    n = len(players)
+    score = [0.0] * n
+    games = [[0] * n for _ in range(n)]
+    for (i, j), (wi, wj, d) in results.items():
+        score[i] += wi + d / 2
+        score[j] += wj + d / 2
+        games[i][j] += wi + wj + d
+        games[j][i] += wi + wj + d
+    # MM iterations for the strengths; a tiny prior keeps unbeaten players finite
+    strength = [1.0] * n
+    for _ in range(iterations):
+        new = []
+        for i in range(n):
+            denom = sum(games[i][j] / (strength[i] + strength[j]) for j in range(n) if games[i][j])
+            new.append((score[i] + 0.5) / (denom + 1.0 / strength[i]) if denom else strength[i])
+        anchor = new[0]
+        new = [s / anchor for s in new]
+        converged = max(abs(a - b) for a, b in zip(new, strength)) < 1e-10
+        strength = new
+        if converged:
+            break
+    rating = [math.log(s) for s in strength]
+
+    # Information matrix, weighting each pair by its observed per-game score variance
+    info = [[0.0] * n for _ in range(n)]
+    for (i, j), (wi, wj, d) in results.items():
+        total = wi + wj + d
+        if not total:
+            continue
+        p = 1 / (1 + math.exp(rating[j] - rating[i]))
+        mean = (wi + d / 2) / total
+        var = max((wi + d / 4) / total - mean * mean, 1e-9)
+        w = total * (p * (1 - p)) ** 2 / var
+        info[i][i] += w
+        info[j][j] += w
+        info[i][j] -= w
+        info[j][i] -= w
+    cov = _invert([row[1:] for row in info[1:]]) if n > 1 else []
+
+    ratings = [(players[0], 0.0, 0.0)]
+    for k in range(1, n):
+        ci = z * math.sqrt(cov[k-1][k-1]) * ELO_SCALE if cov else float('inf')
+        ratings.append((players[k], rating[k] * ELO_SCALE, ci))
+    return ratings
+
+
+def run_tournament(players, games=1000, workers=None, seed=None, chunk_size=50,
+                   radius=MAP_RADIUS, max_units=MAX_UNITS, max_turns=100):
+    """Play `games` games for every pair of weight files, alternating sides
+    between chunks. Returns {(i, j): [i_wins, j_wins, draws]}.
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    results = {pair: [0, 0, 0] for pair in itertools.combinations(range(len(players)), 2)}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {}
+        chunk_id = 0
+        for (i, j) in results:
+            remaining = games
+            swap = False
+            while remaining > 0:
+                n = min(chunk_size, remaining)
+                a, b = (j, i) if swap else (i, j)
+                fut = pool.submit(play_chunk, players[a], players[b], n, f'{seed}-{chunk_id}',
+                                  radius, max_units, max_turns)
+                futures[fut] = (i, j, swap)
+                chunk_id += 1
+                remaining -= n
+                swap = not swap
+        # Workers only return small tallies; all aggregation happens here
+        for fut in as_completed(futures):
+            i, j, swap = futures[fut]
+            a_wins, b_wins, draws = fut.result()
+            if swap:
+                a_wins, b_wins = b_wins, a_wins
+            tally = results[(i, j)]
+            tally[0] += a_wins
+            tally[1] += b_wins
+            tally[2] += draws
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Round-robin tournament between RLAI weight files.')
+    parser.add_argument('weights', nargs='+', help='weights files; the first is the Elo anchor (0)')
+    parser.add_argument('--games', type=int, default=1000, help='games per pair')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--chunk', type=int, default=50, help='games per worker task')
+    parser.add_argument('--radius', type=int, default=MAP_RADIUS)
+    parser.add_argument('--units', type=int, default=MAX_UNITS)
+    parser.add_argument('--max-turns', type=int, default=100)
+    args = parser.parse_args(argv)
+    if len(args.weights) < 2:
+        parser.error('need at least two weights files')
+
+    start = time.perf_counter()
+    results = run_tournament(args.weights, args.games, args.workers, args.seed, args.chunk,
+                             args.radius, args.units, args.max_turns)
+    elapsed = time.perf_counter() - start
+    total = sum(sum(t) for t in results.values())
+
+    for (i, j), (wi, wj, d) in results.items():
+        print(f'{args.weights[i]} vs {args.weights[j]}: {wi}-{wj} ({d} draws)')
+    print()
+    ratings = elo_ratings(args.weights, results)
+    for name, elo, ci in sorted(ratings, key=lambda r: -r[1]):
+        print(f'{elo:+8.1f} ± {ci:6.1f}  {name}')
+    print(f'\n{total} games in {elapsed:.1f}s ({total / elapsed:.1f} games/sec)')
+    return ratings
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+# tune.py
+# Evolution-strategy tuner for the eight RLAI weights: candidates race the current
+# weights in AI-vs-AI games on all cores and drop out as soon as an SPRT decides.
+# Usage: python tune.py --generations 20 --out tuned_weights.json [--resume]
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from settings import MAP_RADIUS, MAX_UNITS
+from engine import GameEngine
+from rl_ai import RLAI
+
+NAMES = list(RLAI.DEFAULT_WEIGHTS)
+# Tuning range of each weight; update_weights_from_game keeps weights in 0.1..2.0
+BOUNDS = {name: (0.1, 2.0) for name in NAMES}
+BOUNDS['retreat_threshold'] = (0.0, 1.0)  # a share of max hp
+
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def play_pairs(candidate, incumbent, pairs, seed, radius=MAP_RADIUS, max_units=MAX_UNITS, max_turns=100):
+    """Play `pairs` pairs of games between two weight dicts; each pair is the same
+    game seed with the sides swapped. Runs in a worker process; returns
+    (candidate_wins, incumbent_wins, draws).
+    """
+    wins = [0, 0, 0]
+    for side in (0, 1):
+        # Same engine seed for both halves, so both sides play the same games
+        engine = GameEngine(radius, max_units, ai_weights={0: 'rl_weights.json', 1: 'rl_weights.json'}, seed=seed)
+        for i in range(pairs):
+            if i:
+                engine.reset()
+            engine.ais[side].weights = dict(candidate)
+            engine.ais[1 - side].weights = dict(incumbent)
+            winner = engine.play(max_turns)
+            if winner is None:
+                wins[2] += 1
+            elif (winner == 'Player') == (side == 0):
+                wins[0] += 1
+            else:
+                wins[1] += 1
+    return tuple(wins)
+
+
+def sprt(wins, losses, draws, elo0=0.0, elo1=20.0, alpha=0.05, beta=0.05):
+    """Sequential probability ratio test of H0 (score of elo0) against H1 (score
+    of elo1) on win/draw/loss counts, with the normal approximation of the
+    generalised log-likelihood ratio. Returns (llr, 'H1', 'H0' or None while undecided).
+    """
+    n = wins + losses + draws
+    if not n:
+        return 0.0, None
+    mean = (wins + draws / 2) / n
+    var = (wins + draws / 4) / n - mean * mean
+    if var <= 0:
+        return 0.0, None
+    s0, s1 = elo_to_score(elo0), elo_to_score(elo1)
+    llr = n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var)
+    if llr >= math.log((1 - beta) / alpha):
+        return llr, 'H1'
+    if llr <= math.log(beta / (1 - alpha)):
+        return llr, 'H0'
+    return llr, None
+
+
+def to_weights(x):
+    """Weights dict for a point of the unit cube (one axis per weight, scaled to BOUNDS)."""
+    return {name: round(BOUNDS[name][0] + v * (BOUNDS[name][1] - BOUNDS[name][0]), 4) for name, v in zip(NAMES, x)}
+
+
+def from_weights(weights):
+    x = []
+    for name in NAMES:
+        lo, hi = BOUNDS[name]
+        x.append(min(1.0, max(0.0, (weights.get(name, RLAI.DEFAULT_WEIGHTS[name]) - lo) / (hi - lo))))
+    return x
+
+
+class Tuner:
+    """(mu/mu_w, lambda) evolution strategy over the RLAI weights.
+
+    Each generation samples `population` candidates around the mean (mirrored
+    pairs, Gaussian steps of `sigma` in the unit cube of BOUNDS) and races
+    them against the mean's weights: every round each undecided candidate
+    plays `batch` more game pairs, on the same seeds for all of them, and an
+    SPRT (elo0 vs elo1) retires it once it is shown better or not better, or
+    when it reaches `max_games`. The best half, ranked by score, moves the
+    mean; sigma grows by 20% when some candidate proved better and shrinks by
+    20% when none did.
+
+    The whole state (mean, sigma, RNG, history) is saved to `checkpoint`
+    after every generation, and Tuner.load() resumes from it.
+    """
+
+    def __init__(self, start=None, population=8, sigma=0.1, batch=20, max_games=400, elo0=0.0, elo1=20.0,
+                 alpha=0.05, beta=0.05, seed=None, radius=MAP_RADIUS, max_units=MAX_UNITS, max_turns=100,
+                 checkpoint='tune_checkpoint.json'):
+        self.mean = from_weights(start or RLAI.DEFAULT_WEIGHTS)
+        self.population = population + population % 2
+        self.sigma = sigma
+        self.batch = batch
+        self.max_games = max_games
+        self.elo0, self.elo1 = elo0, elo1
+        self.alpha, self.beta = alpha, beta
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.rng = random.Random(self.seed)
+        self.radius, self.max_units, self.max_turns = radius, max_units, max_turns
+        self.checkpoint = checkpoint
+        self.generation = 0
+        self.games = 0
+        self.history = []
+
+    SETTINGS = ('population', 'sigma', 'batch', 'max_games', 'elo0', 'elo1', 'alpha', 'beta', 'seed',
+                'radius', 'max_units', 'max_turns', 'generation', 'games', 'mean', 'history')
+
+    def save(self):
+        state = {name: getattr(self, name) for name in self.SETTINGS}
+        version, internal, gauss = self.rng.getstate()
+        state['rng'] = [version, list(internal), gauss]
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint)  # a crash mid-write keeps the previous checkpoint
+
+    @classmethod
+    def load(cls, checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        tuner = cls(checkpoint=checkpoint)
+        for name in cls.SETTINGS:
+            setattr(tuner, name, state[name])
+        version, internal, gauss = state['rng']
+        tuner.rng.setstate((version, tuple(internal), gauss))
+        return tuner
+
+    @property
+    def weights(self):
+        return to_weights(self.mean)
+
+    def sample(self):
+        """The generation's candidates as points of the unit cube, in mirrored pairs."""
+        points = []
+        for _ in range(self.population // 2):
+            step = [self.rng.gauss(0, self.sigma) for _ in NAMES]
+            for sign in (1, -1):
+                points.append([min(1.0, max(0.0, m + sign * s)) for m, s in zip(self.mean, step)])
+        return points
+
+    def race(self, pool, candidates):
+        """Race the candidates against the mean's weights. Returns their
+        [wins, losses, draws] tallies and SPRT verdicts."""
+        incumbent = self.weights
+        weights = [to_weights(x) for x in candidates]
+        tallies = [[0, 0, 0] for _ in candidates]
+        verdicts = [None] * len(candidates)
+        racing = list(range(len(candidates)))
+        round_no = 0
+        while racing:
+            # One seed per round for every candidate: differences come from the weights, not the dice
+            seed = f'{self.seed}-{self.generation}-{round_no}'
+            futures = {k: pool.submit(play_pairs, weights[k], incumbent, self.batch, seed,
+                                      self.radius, self.max_units, self.max_turns) for k in racing}
+            for k, fut in futures.items():
+                for t, v in enumerate(fut.result()):
+                    tallies[k][t] += v
+            still = []
+            for k in racing:
+                wins, losses, draws = tallies[k]
+                _, verdict = sprt(wins, losses, draws, self.elo0, self.elo1, self.alpha, self.beta)
+                verdicts[k] = verdict
+                if verdict is None and sum(tallies[k]) < self.max_games:
+                    still.append(k)
+            racing = still
+            round_no += 1
+        return tallies, verdicts
+
+    def step(self, pool):
+        """Run one generation; returns its history entry."""
+        candidates = self.sample()
+        tallies, verdicts = self.race(pool, candidates)
+        scores = [(w + d / 2) / (w + l + d) for w, l, d in tallies]
+        order = sorted(range(len(candidates)), key=lambda k: -scores[k])
+        mu = len(candidates) // 2
+        ranks = [math.log(mu + 0.5) - math.log(i + 1) for i in range(mu)]
+        total = sum(ranks)
+        self.mean = [sum(r / total * candidates[k][d] for r, k in zip(ranks, order))
+                     for d in range(len(NAMES))]
+        if 'H1' in verdicts:
+            self.sigma = min(0.5, self.sigma * 1.2)
+        else:
+            self.sigma = max(0.005, self.sigma * 0.8)
+        games = sum(sum(t) for t in tallies)
+        self.games += games
+        self.generation += 1
+        entry = {'generation': self.generation, 'games': games, 'best_score': scores[order[0]],
+                 'accepted': verdicts.count('H1'), 'rejected': verdicts.count('H0'), 'sigma': self.sigma,
+                 'weights': self.weights}
+        self.history.append(entry)
+        self.save()
+        return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tune the RLAI weights with an evolution strategy.')
+    parser.add_argument('--start', default='rl_weights.json', help='weights file to start from')
+    parser.add_argument('--out', default='tuned_weights.json', help='weights file written after every generation')
+    parser.add_argument('--checkpoint', default='tune_checkpoint.json')
+    parser.add_argument('--resume', action='store_true', help='continue from --checkpoint')
+    parser.add_argument('--generations', type=int, default=20, help='generations to run (more on --resume)')
+    parser.add_argument('--population', type=int, default=8, help='candidates per generation (even)')
+    parser.add_argument('--sigma', type=float, default=0.1, help='initial step size (share of each range)')
+    parser.add_argument('--batch', type=int, default=20, help='game pairs per candidate per round')
+    parser.add_argument('--max-games', type=int, default=400, help='games per candidate at most')
+    parser.add_argument('--elo0', type=float, default=0.0)
+    parser.add_argument('--elo1', type=float, default=20.0)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--radius', type=int, default=MAP_RADIUS)
+    parser.add_argument('--units', type=int, default=MAX_UNITS)
+    parser.add_argument('--max-turns', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    if args.resume:
+        tuner = Tuner.load(args.checkpoint)
+        print(f'resuming at generation {tuner.generation} ({tuner.games} games so far)')
+    else:
+        start = None
+        if os.path.exists(args.start):
+            with open(args.start) as f:
+                start = json.load(f)
+        tuner = Tuner(start, args.population, args.sigma, args.batch, args.max_games, args.elo0, args.elo1,
+                      args.alpha, args.beta, args.seed, args.radius, args.units, args.max_turns, args.checkpoint)
+    start_time = time.perf_counter()
+    games = 0
+    with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count()) as pool:
+        for _ in range(args.generations):
+            entry = tuner.step(pool)
+            games += entry['games']
+            with open(args.out, 'w') as f:
+                json.dump(tuner.weights, f, indent=2)
+            budget = tuner.population * tuner.max_games
+            print(f"gen {entry['generation']:3}: {entry['games']:5} games ({budget - entry['games']} saved), "
+                  f"best {entry['best_score']:.3f}, {entry['accepted']} better / {entry['rejected']} not, "
+                  f"sigma {entry['sigma']:.3f}")
+    elapsed = time.perf_counter() - start_time
+    print(f'\n{games} games in {elapsed:.1f}s ({games / elapsed:.1f} games/sec); weights in {args.out}')
+    for name, value in tuner.weights.items():
+        print(f'  {name:24} {value:.4f}')
+    return tuner
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,81 @@
 # Small UI helpers for buttons and simple labels.
+from collections import OrderedDict
 import pygame
 from settings import BLACK, GRAY, WHITE
 
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces keyed by (font, text, color)."""
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color=BLACK, antialias=True):
+        key = (font, text, color, antialias)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self.entries[key] = surf
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surf
+
+    def size(self, font, text):
+        return self.render(font, text).get_size()
+
+    def clear(self):
+        self.entries.clear()
+
+class PanelCache:
+    """Pre-drawn panels (tooltips, overlays) kept until their content key changes."""
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key, build):
+        # build() draws the panel and is only called when key is not cached
+        surf = self.entries.get(key)
+        if surf is None:
+            surf = build()
+            self.entries[key] = surf
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return surf
+
+text_cache = TextCache()
+panel_cache = PanelCache()
+
+def render_text(font, text, color=BLACK):
+    return text_cache.render(font, text, color)
+
 def draw_button(surface, rect, text, font, bg=GRAY, fg=BLACK):
     pygame.draw.rect(surface, bg, rect)
     pygame.draw.rect(surface, BLACK, rect, 2)
-    label = font.render(text, True, fg)
+    label = render_text(font, text, fg)
     surface.blit(label, (rect.x + (rect.width - label.get_width())//2,
                          rect.y + (rect.height - label.get_height())//2))
 
 def draw_title(surface, title, subtitle, font_title, font_sub, y_offset=40):
     w = surface.get_width()
-    title_surf = font_title.render(title, True, BLACK)
-    sub_surf = font_sub.render(subtitle, True, BLACK)
+    title_surf = render_text(font_title, title, BLACK)
+    sub_surf = render_text(font_sub, subtitle, BLACK)
     surface.blit(title_surf, (w//2 - title_surf.get_width()//2, y_offset))
     surface.blit(sub_surf, (w//2 - sub_surf.get_width()//2, y_offset + title_surf.get_height() + 8))
+
+def build_tooltip(lines, font, bg=(255, 255, 220), line_height=16):
+    # Tooltip box sized to its lines
+    tip_w = max(text_cache.size(font, line)[0] for line in lines) + 10
+    tip_h = len(lines) * line_height + 6
+    surf = pygame.Surface((tip_w, tip_h))
+    surf.fill(bg)
+    pygame.draw.rect(surf, BLACK, surf.get_rect(), 1)
+    for i, line in enumerate(lines):
+        surf.blit(render_text(font, line, BLACK), (5, 3 + i*line_height))
+    return surf
@@ -0,0 +1,231 @@
+# warehouse.py
+# SQLite store of games, units and attacks across many games, with a report CLI.
+# Usage: python warehouse.py ingest events.bin [--db tinyhex.db]
+#        python warehouse.py report [--unit-type Archer] [--forest] [--last 50000]
+#        python warehouse.py sql "SELECT count(*) FROM attacks"
+import argparse
+import sqlite3
+import time
+from eventlog import GAME_START, SPAWN, MOVE, ATTACK, DEATH, GAME_END, read_events
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id INTEGER PRIMARY KEY,
+    radius INTEGER,
+    max_units INTEGER,
+    turns INTEGER,
+    winner INTEGER          -- 0 = player side, 1 = AI side, -1 = draw
+);
+CREATE TABLE IF NOT EXISTS units (
+    game_id INTEGER,
+    unit_id INTEGER,
+    owner INTEGER,
+    unit_type TEXT,         -- 'Ground' or 'Archer'
+    spawn_q INTEGER,
+    spawn_r INTEGER,
+    max_hp INTEGER,
+    moves INTEGER,
+    turn_killed INTEGER,    -- NULL if it survived
+    PRIMARY KEY (game_id, unit_id)
+);
+CREATE TABLE IF NOT EXISTS attacks (
+    game_id INTEGER,
+    turn INTEGER,
+    unit_id INTEGER,
+    owner INTEGER,
+    unit_type TEXT,         -- attacker's type, copied here so reports need no join
+    target_id INTEGER,
+    forest INTEGER,         -- 1 if the target stood in forest
+    hit INTEGER,
+    damage INTEGER,
+    roll REAL
+);
+CREATE INDEX IF NOT EXISTS units_owner ON units (owner, unit_type);
+-- each index covers the hit-rate reports (grouped by type and cover, summing hit and
+-- damage), so a filtered report never touches the table itself
+CREATE INDEX IF NOT EXISTS attacks_type ON attacks (unit_type, forest, game_id, hit, damage);
+CREATE INDEX IF NOT EXISTS attacks_owner ON attacks (owner, unit_type, forest, game_id, hit, damage);
+CREATE INDEX IF NOT EXISTS attacks_turn ON attacks (turn, unit_type, forest, game_id, hit, damage);
+"""
+
+UNIT_TYPES = ('Ground', 'Archer')
+
+
+class Warehouse:
+    """Stats database. Rows are buffered and inserted with executemany in one
+    transaction per batch.
+
+    It can be fed recorded events with ingest(), or take the place of an
+    EventLog (new_game/emit/flush/close) so games write to it directly.
+    """
+
+    def __init__(self, path='tinyhex.db', batch_size=20000):
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._next_game = self.conn.execute('SELECT coalesce(max(game_id), -1) + 1 FROM games').fetchone()[0]
+        self._games = []
+        self._units = []
+        self._attacks = []
+        self._open = {}  # game -> {'meta': [...], 'units': {unit_id: row}} until its game_end
+
+    def new_game(self):
+        game = self._next_game
+        self._next_game += 1
+        return game
+
+    def emit(self, kind, game, turn, *fields):
+        g = self._open.get(game)
+        if g is None:
+            g = self._open[game] = {'meta': [game, 0, 0, 0, -1], 'units': {}}
+        if kind == ATTACK:
+            unit, owner, target, hit, dmg, forest, roll = fields
+            u = g['units'].get(unit)
+            self._attacks.append((game, turn, unit, owner, u[3] if u else None, target, forest, hit, dmg, roll))
+            if len(self._attacks) >= self.batch_size:
+                self.flush()
+        elif kind == MOVE:
+            u = g['units'].get(fields[0])
+            if u:
+                u[7] += 1
+        elif kind == SPAWN:
+            unit, owner, archer, q, r, max_hp = fields
+            g['units'][unit] = [game, unit, owner, UNIT_TYPES[archer], q, r, max_hp, 0, None]
+        elif kind == DEATH:
+            u = g['units'].get(fields[0])
+            if u:
+                u[8] = turn
+        elif kind == GAME_START:
+            g['meta'][1:3] = fields
+        elif kind == GAME_END:
+            meta = g['meta']
+            meta[3], meta[4] = turn, fields[0]
+            self._games.append(tuple(meta))
+            self._units.extend(map(tuple, g['units'].values()))
+            del self._open[game]
+
+    def ingest(self, events):
+        """Load recorded events (e.g. eventlog.read_events). Games get fresh ids
+        after those already stored. Returns the number of games added."""
+        ids = {}
+        for event in events:
+            kind, game, turn = event[:3]
+            new = ids.get(game)
+            if new is None:
+                new = ids[game] = self.new_game()
+            self.emit(kind, new, turn, *event[3:])
+        self.flush()
+        return len(ids)
+
+    def flush(self):
+        """Insert the buffered rows in one transaction. Unfinished games stay buffered."""
+        with self.conn:
+            if self._games:
+                self.conn.executemany('INSERT INTO games VALUES (?, ?, ?, ?, ?)', self._games)
+            if self._units:
+                self.conn.executemany('INSERT INTO units VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', self._units)
+            if self._attacks:
+                self.conn.executemany('INSERT INTO attacks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', self._attacks)
+        self._games, self._units, self._attacks = [], [], []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def attack_report(self, unit_type=None, forest=None, owner=None, last=None, min_turn=None, max_turn=None):
+        """Attack aggregates grouped by attacker type and target cover, as a list of
+        dicts. Filters are optional; `last` keeps only the most recent `last` games."""
+        where, args = [], []
+        if unit_type is not None:
+            where.append('unit_type = ?')
+            args.append(unit_type)
+        if forest is not None:
+            where.append('forest = ?')
+            args.append(int(forest))
+        if owner is not None:
+            where.append('owner = ?')
+            args.append(owner)
+        if last is not None:
+            where.append('game_id >= (SELECT max(game_id) FROM games) - ?')
+            args.append(last - 1)
+        if min_turn is not None:
+            where.append('turn >= ?')
+            args.append(min_turn)
+        if max_turn is not None:
+            where.append('turn <= ?')
+            args.append(max_turn)
+        sql = ('SELECT unit_type, forest, count(*), sum(hit), sum(damage) FROM attacks'
+               + (' WHERE ' + ' AND '.join(where) if where else '')
+               + ' GROUP BY unit_type, forest ORDER BY unit_type, forest')
+        rows = []
+        for unit_type, forest, attacks, hits, damage in self.conn.execute(sql, args):
+            rows.append({
+                'unit_type': unit_type, 'forest': bool(forest), 'attacks': attacks, 'hits': hits,
+                'hit_rate': hits / attacks if attacks else 0.0,
+                'avg_damage': damage / hits if hits else 0.0,
+            })
+        return rows
+
+    def game_report(self, last=None):
+        """Games, wins per side, draws and average length."""
+        sql = 'SELECT count(*), sum(winner = 0), sum(winner = 1), sum(winner = -1), avg(turns) FROM games'
+        args = []
+        if last is not None:
+            sql += ' WHERE game_id >= (SELECT max(game_id) FROM games) - ?'
+            args.append(last - 1)
+        games, w0, w1, draws, turns = self.conn.execute(sql, args).fetchone()
+        return {'games': games, 'side0_wins': w0 or 0, 'side1_wins': w1 or 0, 'draws': draws or 0,
+                'avg_turns': turns or 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='TinyHex stats warehouse (SQLite).')
+    parser.add_argument('--db', default='tinyhex.db')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('ingest', help='load event logs written by eventlog.py')
+    p.add_argument('logs', nargs='+')
+    p = sub.add_parser('report', help='attack hit rates and win counts')
+    p.add_argument('--unit-type', choices=UNIT_TYPES)
+    cover = p.add_mutually_exclusive_group()
+    cover.add_argument('--forest', dest='forest', action='store_const', const=True, help='targets in forest only')
+    cover.add_argument('--open', dest='forest', action='store_const', const=False, help='targets in the open only')
+    p.add_argument('--owner', type=int, choices=(0, 1))
+    p.add_argument('--last', type=int, help='only the most recent N games')
+    p.add_argument('--min-turn', type=int)
+    p.add_argument('--max-turn', type=int)
+    p = sub.add_parser('sql', help='run a query and print the rows')
+    p.add_argument('query')
+    args = parser.parse_args(argv)
+
+    with Warehouse(args.db) as wh:
+        start = time.perf_counter()
+        if args.command == 'ingest':
+            for path in args.logs:
+                n = wh.ingest(read_events(path))
+                print(f'{path}: {n} games')
+        elif args.command == 'report':
+            for k, v in wh.game_report(args.last).items():
+                print(f'{k}: {v:.2f}' if isinstance(v, float) else f'{k}: {v}')
+            print()
+            print(f"{'type':8} {'cover':6} {'attacks':>9} {'hits':>9} {'hit rate':>9} {'avg dmg':>8}")
+            for row in wh.attack_report(args.unit_type, args.forest, args.owner, args.last,
+                                        args.min_turn, args.max_turn):
+                print(f"{row['unit_type']:8} {'forest' if row['forest'] else 'open':6} {row['attacks']:9d} "
+                      f"{row['hits']:9d} {row['hit_rate']:9.3f} {row['avg_damage']:8.2f}")
+        else:
+            for row in wh.conn.execute(args.query):
+                print(*row, sep='\t')
+        print(f'\n({time.perf_counter() - start:.3f}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# zobrist.py
+# Zobrist keys for GameState positions and a fixed-size transposition table
+# that caches search results (value, best action) by position key.
+import random
+
+# Keys are drawn from a fixed seed so a position has the same key in every run
+ZOBRIST_SEED = 0x7148E1
+
+
+class ZobristKeys:
+    """Random 64-bit keys for the boards of one size.
+
+    A position's key is the XOR of a piece key per living unit, over (cell,
+    owner, unit type, hp bucket), a flag key for each unit that has moved or
+    attacked this phase, over (cell, flag), and the side key when side 1 is
+    to play. `hp_bucket` hp points share a key (1 keeps hp exact). actor keys
+    (one per cell) mark which unit is deciding, for search nodes.
+    """
+
+    def __init__(self, cells, max_hp=10, hp_bucket=1, seed=ZOBRIST_SEED):
+        rng = random.Random(seed)
+        self.hp_bucket = hp_bucket
+        self.buckets = max_hp // hp_bucket + 1
+        self.stride = 4 * self.buckets  # piece keys per cell
+        self.piece = [rng.getrandbits(64) for _ in range(cells * self.stride)]
+        self.moved = [rng.getrandbits(64) for _ in range(cells)]
+        self.attacked = [rng.getrandbits(64) for _ in range(cells)]
+        self.actor = [rng.getrandbits(64) for _ in range(cells)]
+        self.side = rng.getrandbits(64)
+
+    def row(self, owner, kind, hp):
+        """Offset of a unit's piece key within its cell's keys."""
+        return (owner * 2 + kind) * self.buckets + min(hp // self.hp_bucket, self.buckets - 1)
+
+    def piece_key(self, cell, owner, kind, hp):
+        return self.piece[cell * self.stride + self.row(owner, kind, hp)]
+
+
+_keys = {}
+
+
+def keys_for(cells, max_hp=10, hp_bucket=1):
+    """Shared ZobristKeys for boards of `cells` cells."""
+    keys = _keys.get((cells, max_hp, hp_bucket))
+    if keys is None:
+        keys = _keys[(cells, max_hp, hp_bucket)] = ZobristKeys(cells, max_hp, hp_bucket)
+    return keys
+
+
+class TranspositionTable:
+    """Fixed-size cache of search results: 2**bits slots indexed by the low
+    bits of the position key, each holding (key, depth, value, action, age).
+
+    Depth is how much search stands behind an entry (e.g. MCTS visits). A
+    store for the position already in its slot keeps the deeper result; a
+    store for another position replaces the entry if that one is from an
+    older search (see new_search()) or no deeper, and is dropped otherwise.
+    """
+
+    def __init__(self, bits=16):
+        size = 1 << bits
+        self.mask = size - 1
+        self.keys = [None] * size
+        self.depths = [0] * size
+        self.values = [0.0] * size
+        self.actions = [None] * size
+        self.ages = [0] * size
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replaced = 0   # entries evicted by another position
+        self.dropped = 0    # stores refused in favour of a deeper entry
+
+    def __len__(self):
+        return len(self.keys) - self.keys.count(None)
+
+    def new_search(self):
+        """Age the current entries; they give way to any store from now on."""
+        self.age += 1
+
+    def probe(self, key):
+        """(depth, value, action) stored for `key`, or None."""
+        self.probes += 1
+        slot = key & self.mask
+        if self.keys[slot] != key:
+            return None
+        self.hits += 1
+        self.ages[slot] = self.age
+        return self.depths[slot], self.values[slot], self.actions[slot]
+
+    def store(self, key, depth, value, action):
+        slot = key & self.mask
+        stored = self.keys[slot]
+        if stored == key:
+            if depth < self.depths[slot]:
+                self.ages[slot] = self.age
+                return
+        elif stored is not None:
+            if self.ages[slot] == self.age and depth < self.depths[slot]:
+                self.dropped += 1
+                return
+            self.replaced += 1
+        self.stores += 1
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.values[slot] = value
+        self.actions[slot] = action
+        self.ages[slot] = self.age
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def report(self):
+        return {'probes': self.probes, 'hits': self.hits, 'hit_rate': self.hit_rate, 'stores': self.stores,
+                'replaced': self.replaced, 'dropped': self.dropped, 'entries': len(self)}
+
+    def clear(self):
+        size = len(self.keys)
+        self.keys = [None] * size
+        self.actions = [None] * size
+        self.depths = [0] * size
+        self.values = [0.0] * size
+        self.ages = [0] * size